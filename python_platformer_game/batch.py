@@ -0,0 +1,202 @@
+"""
+Many simulated playthroughs run in parallel, for checking level design
+
+Each run plays from a level with random input from its own seed, or
+with the input of a recording, until the game is complete or it runs
+out of ticks. Runs are spread over a pool of processes, each of which
+parses a level only once, and their results are written as JSON lines
+as soon as they finish.
+
+Usage: python batch.py [--runs N] [--level N] [--ticks N] [--workers N]
+                       [--output FILE] [RECORDING ...]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import Counter
+
+from level_cache import LevelCache
+from replay import Recording, INPUT_MASK
+from simulation import (Simulation, EVENT_COIN, EVENT_DEATH,
+                        EVENT_LEVEL_COMPLETE)
+from benchmark import scripted_inputs
+
+DEFAULT_RUNS = 1000
+DEFAULT_TICKS = 20000
+
+# Runs handed to a worker at a time, fewer round trips between processes
+RUNS_PER_TASK = 4
+
+# Size of the squares deaths are counted in for the summary, game pixels
+HOTSPOT_SIZE = 64
+
+# Levels parsed by this worker process, made by init_worker()
+worker_cache = None
+
+
+def init_worker():
+    '''
+    Function run once in every worker process
+    '''
+    global worker_cache
+    worker_cache = LevelCache()
+
+
+def play(run):
+    '''
+    Function to play one run, a dict with id, level, ticks and either
+    seed or recording. Returns the results of the run as a dict.
+    '''
+    if worker_cache is None:
+        init_worker()
+
+    if run.get("recording"):
+        recording = Recording.load(run["recording"])
+        level = recording.start_level
+        inputs = iter([value & INPUT_MASK for value in recording.ticks])
+        ticks = len(recording.ticks)
+    else:
+        level = run["level"]
+        inputs = scripted_inputs(run["seed"])
+        ticks = run["ticks"]
+
+    start = time.perf_counter()
+    simulation = Simulation(level, worker_cache)
+    coins = 0
+    levels_completed = 0
+    deaths = []
+
+    for keys in inputs:
+        if simulation.tick >= ticks or simulation.game_complete:
+            break
+        dying_on = simulation.level
+        for event in simulation.step(keys):
+            if event == EVENT_COIN:
+                coins += 1
+            elif event == EVENT_DEATH:
+                x, y = simulation.death_position
+                deaths.append({"level": dying_on, "tick": simulation.tick,
+                               "x": round(x, 1), "y": round(y, 1)})
+            elif event == EVENT_LEVEL_COMPLETE:
+                levels_completed += 1
+
+    if simulation.game_complete:
+        levels_completed += 1
+    return {
+        "id": run["id"],
+        "seed": run.get("seed"),
+        "recording": run.get("recording"),
+        "start_level": level,
+        "end_level": simulation.level,
+        "ticks": simulation.tick,
+        "coins": coins,
+        "deaths": len(deaths),
+        "death_locations": deaths,
+        "levels_completed": levels_completed,
+        "complete": simulation.game_complete,
+        "completion_time": (simulation.displaytotaltime
+                            if simulation.game_complete else None),
+        "elapsed": time.perf_counter() - start,
+    }
+
+
+def make_runs(args):
+    '''
+    Function to list the runs asked for on the command line
+    '''
+    if args.recordings:
+        return [{"id": index, "recording": filename}
+                for index, filename in enumerate(args.recordings)]
+    return [{"id": index, "level": args.level, "ticks": args.ticks,
+             "seed": args.seed + index} for index in range(args.runs)]
+
+
+def run_batch(runs, workers=None):
+    '''
+    Function to play runs over a pool of processes, yielding the result
+    of each run as soon as it finishes
+    '''
+    if workers == 1:
+        for run in runs:
+            yield play(run)
+        return
+    with multiprocessing.Pool(workers, initializer=init_worker) as pool:
+        yield from pool.imap_unordered(play, runs, RUNS_PER_TASK)
+
+
+def summarize(results):
+    '''
+    Function to print totals over every run and where deaths cluster
+    '''
+    count = len(results)
+    if not count:
+        return
+    complete = [result for result in results if result["complete"]]
+    coins = sum(result["coins"] for result in results) / count
+    deaths = sum(result["deaths"] for result in results) / count
+    print(f"{count} runs, {len(complete)} complete, {coins:.1f} coins and "
+          f"{deaths:.1f} deaths per run")
+    if complete:
+        times = sorted(result["completion_time"] for result in complete)
+        print(f"completion time best {times[0]:.2f}, "
+              f"median {times[len(times) // 2]:.2f}")
+
+    hotspots = Counter()
+    for result in results:
+        for death in result["death_locations"]:
+            hotspots[(death["level"], int(death["x"] // HOTSPOT_SIZE),
+                      int(death["y"] // HOTSPOT_SIZE))] += 1
+    for (level, x, y), deaths in hotspots.most_common(10):
+        print(f"    level {level} around ({x * HOTSPOT_SIZE}, "
+              f"{y * HOTSPOT_SIZE}): {deaths} deaths")
+
+
+def main(argv=None):
+    """
+    Play the runs and write their results
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument("recordings", nargs="*",
+                        help="play these recordings instead of random runs")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--level", type=int, default=1)
+    parser.add_argument("--ticks", type=int, default=DEFAULT_TICKS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="processes to use, 1 runs everything here")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write one JSON line per run to this file")
+    args = parser.parse_args(argv)
+
+    runs = make_runs(args)
+    results = []
+    output = open(args.output, "w") if args.output else None
+    start = time.perf_counter()
+    try:
+        for result in run_batch(runs, args.workers):
+            results.append(result)
+            if output:
+                output.write(json.dumps(result) + "\n")
+                output.flush()
+            else:
+                print(f"run {result['id']}: level {result['end_level']}, "
+                      f"{result['coins']} coins, {result['deaths']} deaths"
+                      f"{', complete' if result['complete'] else ''}")
+    finally:
+        if output:
+            output.close()
+
+    elapsed = time.perf_counter() - start
+    ticks = sum(result["ticks"] for result in results)
+    print(f"Played {ticks} ticks in {elapsed:.2f}s "
+          f"({ticks / elapsed:.0f} ticks/s)")
+    summarize(results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
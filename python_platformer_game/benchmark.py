@@ -0,0 +1,356 @@
+"""
+Headless benchmark of the shipped levels, and of bigger copies of them
+
+Each level is loaded and played with scripted input for a number of
+ticks with no window, in a process of its own so the peak memory is
+that of the one benchmark. The results are printed and can be written
+as JSON and compared with the results of an earlier commit.
+
+Usage: python benchmark.py [--ticks N] [--scale N] [--output FILE]
+                           [--compare FILE]
+"""
+import argparse
+import base64
+import gc
+import json
+import multiprocessing
+import os
+import platform
+import random
+import shutil
+import struct
+import sys
+import tempfile
+import time
+import tracemalloc
+import zlib
+from xml.etree import ElementTree
+
+import arcade
+
+from constants import TILE_SCALING
+from chunks import ChunkedMap, write_chunked_level
+from level_cache import Level, LevelCache, StreamedLevel, level_map_name
+from simulation import (Simulation, INPUT_UP, INPUT_DOWN, INPUT_LEFT,
+                        INPUT_RIGHT)
+
+try:
+    import resource
+except ImportError:
+    # Not on Windows, peak memory is then left out
+    resource = None
+
+LEVELS = (1, 2, 3)
+DEFAULT_TICKS = 5000
+
+# Respawns timed for each level
+RESPAWN_RUNS = 20
+
+# Ticks run with tracemalloc on to count allocations
+ALLOCATION_TICKS = 500
+
+# Slowdown against a baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.10
+
+# Input held for a while by the scripted player
+SCRIPTED_INPUTS = (INPUT_RIGHT, INPUT_RIGHT | INPUT_UP, INPUT_LEFT,
+                   INPUT_LEFT | INPUT_UP, INPUT_UP, INPUT_DOWN, 0)
+
+# Properties of map objects that are x positions in game pixels
+X_PROPERTIES = ("boundary_left", "boundary_right", "destination_x")
+
+
+def scripted_inputs(seed=0):
+    '''
+    Function giving the input mask of every tick, the same for a seed
+    '''
+    rng = random.Random(seed)
+    while True:
+        keys = rng.choice(SCRIPTED_INPUTS)
+        for _ in range(rng.randint(10, 90)):
+            yield keys
+
+
+def peak_rss_kb():
+    '''
+    Function to find the most memory the process has used, in KB. It
+    never goes down, so each benchmark runs in a new process.
+    '''
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS gives bytes, Linux kilobytes
+    if sys.platform == "darwin":
+        peak //= 1024
+    return peak
+
+
+def write_scaled_map(map_file, scale, output):
+    '''
+    Function to write a copy of a map made scale times as wide by
+    putting copies of it side by side, each with its own coins, enemies
+    and moving platforms. The player still spawns in the first copy.
+    '''
+    map_dir = os.path.dirname(os.path.abspath(map_file))
+    tree = ElementTree.parse(map_file)
+    root = tree.getroot()
+    width = int(root.attrib["width"])
+    height = int(root.attrib["height"])
+    tile_width = int(root.attrib["tilewidth"])
+    root.attrib["width"] = str(width * scale)
+
+    # The copy is written somewhere else, so files are found by full path
+    for element in root.iter():
+        if element.tag in ("tileset", "image") and "source" in element.attrib:
+            element.attrib["source"] = os.path.normpath(
+                os.path.join(map_dir, element.attrib["source"]))
+
+    for layer in root.iter("layer"):
+        data = layer.find("data")
+        if data.attrib.get("encoding") == "csv":
+            gids = [int(gid) for gid in data.text.replace("\n", "").split(",")
+                    if gid.strip()]
+        else:
+            raw = base64.b64decode(data.text.strip())
+            if data.attrib.get("compression") == "zlib":
+                raw = zlib.decompress(raw)
+            gids = list(struct.unpack(f"<{len(raw) // 4}I", raw))
+
+        scaled = []
+        for row in range(height):
+            scaled.extend(gids[row * width:(row + 1) * width] * scale)
+        data.attrib.update({"encoding": "base64", "compression": "zlib"})
+        data.text = base64.b64encode(zlib.compress(
+            struct.pack(f"<{len(scaled)}I", *scaled))).decode()
+        layer.attrib["width"] = str(width * scale)
+
+    next_id = int(root.attrib["nextobjectid"])
+    for group in root.iter("objectgroup"):
+        originals = list(group.findall("object"))
+        for copy in range(1, scale):
+            offset = copy * width * tile_width
+            for tiled_object in originals:
+                properties = tiled_object.find("properties")
+                names = set()
+                if properties is not None:
+                    names = {prop.attrib["name"] for prop in properties}
+                if "spawn_x" in names:
+                    continue
+                clone = ElementTree.fromstring(
+                    ElementTree.tostring(tiled_object))
+                clone.attrib["id"] = str(next_id)
+                next_id += 1
+                clone.attrib["x"] = str(float(clone.attrib["x"]) + offset)
+                for prop in clone.iter("property"):
+                    if prop.attrib["name"] in X_PROPERTIES:
+                        prop.attrib["value"] = str(
+                            float(prop.attrib["value"]) +
+                            offset * TILE_SCALING)
+                group.append(clone)
+    root.attrib["nextobjectid"] = str(next_id)
+
+    tree.write(output, encoding="UTF-8", xml_declaration=True)
+
+
+def load_timed(load):
+    '''
+    Function to call a loader, returning what it made and the time taken
+    in milliseconds
+    '''
+    start = time.perf_counter()
+    loaded = load()
+    return loaded, (time.perf_counter() - start) * 1000
+
+
+def make_loader(benchmark):
+    '''
+    Function to return what loads the level of a benchmark, a dict with
+    name, level, kind and for map copies the file to load
+    '''
+    level = benchmark["level"]
+    if benchmark["kind"] == "tmx":
+        return lambda: Level(level, benchmark["file"])
+    if benchmark["kind"] == "chunks":
+        return lambda: StreamedLevel(level, ChunkedMap(benchmark["file"]))
+    return lambda: LevelCache().get(level)
+
+
+def run_benchmark(benchmark, ticks, seed):
+    '''
+    Function to benchmark one level. The level is loaded and then
+    played for a number of ticks.
+    '''
+    name = benchmark["name"]
+    level = benchmark["level"]
+    gc.collect()
+    loaded, load_ms = load_timed(make_loader(benchmark))
+    level_cache = LevelCache()
+    level_cache.add(level, loaded)
+    simulation = Simulation(level, level_cache)
+
+    # Respawning only resets the cached level
+    start = time.perf_counter()
+    for _ in range(RESPAWN_RUNS):
+        simulation.setup()
+    respawn_ms = (time.perf_counter() - start) * 1000 / RESPAWN_RUNS
+
+    inputs = scripted_inputs(seed)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        simulation.step(next(inputs))
+    elapsed = time.perf_counter() - start
+
+    # Allocations are counted on a separate run, tracemalloc slows
+    # everything down
+    allocation_ticks = min(ticks, ALLOCATION_TICKS)
+    simulation.setup()
+    inputs = scripted_inputs(seed)
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    transient = 0
+    for _ in range(allocation_ticks):
+        before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        simulation.step(next(inputs))
+        transient += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    blocks = sys.getallocatedblocks() - blocks
+
+    # Memory a loaded level holds, taken from a second copy so the
+    # textures the first one put in the shared registry aren't counted
+    gc.collect()
+    tracemalloc.start()
+    copy = make_loader(benchmark)()
+    gc.collect()
+    level_kb = tracemalloc.get_traced_memory()[0] // 1024
+    tracemalloc.stop()
+    copy.close()
+
+    return {
+        "name": name,
+        "kind": type(loaded).__name__,
+        "ticks": ticks,
+        "load_ms": load_ms,
+        "respawn_ms": respawn_ms,
+        "ticks_per_second": ticks / elapsed,
+        "peak_rss_kb": peak_rss_kb(),
+        "level_kb": level_kb,
+        "blocks_per_tick": blocks / max(allocation_ticks, 1),
+        "peak_bytes_per_tick": transient / max(allocation_ticks, 1),
+        "deaths": simulation.death,
+    }
+
+
+def run_isolated(benchmark, ticks, seed):
+    '''
+    Function to run one benchmark in a new process and return its result
+    '''
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1) as pool:
+        return pool.apply(run_benchmark, (benchmark, ticks, seed))
+
+
+def benchmarks(levels, scale, work_dir):
+    '''
+    Function to list every benchmark, see make_loader()
+    '''
+    for level in levels:
+        yield {"name": f"level_{level}", "level": level, "kind": "cache"}
+
+    if scale <= 1:
+        return
+    for level in levels:
+        map_file = os.path.join(work_dir, f"level_{level}_x{scale}.tmx")
+        write_scaled_map(level_map_name(level), scale, map_file)
+        chunk_file = os.path.splitext(map_file)[0] + ".chunks"
+        write_chunked_level(map_file, chunk_file)
+        yield {"name": f"level_{level}_x{scale}_tmx", "level": level,
+               "kind": "tmx", "file": map_file}
+        yield {"name": f"level_{level}_x{scale}_chunks", "level": level,
+               "kind": "chunks", "file": chunk_file}
+
+
+def compare(results, baseline, tolerance):
+    '''
+    Function to print how results changed against a baseline.
+    Returns the names of the benchmarks that got slower.
+    '''
+    old = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        before = old.get(result["name"])
+        if before is None:
+            continue
+        changes = []
+        slower = False
+        for key, higher_is_better in (("ticks_per_second", True),
+                                      ("load_ms", False),
+                                      ("respawn_ms", False)):
+            if not before[key]:
+                continue
+            change = result[key] / before[key] - 1
+            changes.append(f"{key} {change:+.1%}")
+            if (-change if higher_is_better else change) > tolerance:
+                slower = True
+        print(f"{result['name']:<24} {', '.join(changes)}"
+              f"{'  REGRESSION' if slower else ''}")
+        if slower:
+            regressions.append(result["name"])
+    return regressions
+
+
+def main(argv=None):
+    """
+    Run the benchmarks and report or compare the results
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument("--ticks", type=int, default=DEFAULT_TICKS)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--levels", type=int, nargs="+", default=LEVELS)
+    parser.add_argument("--scale", type=int, default=1,
+                        help="also run maps this many times as wide")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write the results as JSON")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare with results written by --output")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    args = parser.parse_args(argv)
+
+    work_dir = tempfile.mkdtemp(prefix="benchmark-")
+    results = []
+    try:
+        print(f"{'benchmark':<24}{'kind':>14}{'ticks/s':>10}{'load ms':>10}"
+              f"{'respawn':>10}{'rss KB':>10}{'level KB':>10}"
+              f"{'B/tick':>10}")
+        for benchmark in benchmarks(args.levels, args.scale, work_dir):
+            result = run_isolated(benchmark, args.ticks, args.seed)
+            results.append(result)
+            print(f"{result['name']:<24}{result['kind']:>14}"
+                  f"{result['ticks_per_second']:>10.0f}"
+                  f"{result['load_ms']:>10.1f}{result['respawn_ms']:>10.2f}"
+                  f"{result['peak_rss_kb'] or 0:>10}"
+                  f"{result['level_kb']:>10}"
+                  f"{result['peak_bytes_per_tick']:>10.0f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"python": platform.python_version(),
+                       "arcade": arcade.version.VERSION,
+                       "platform": platform.platform(),
+                       "ticks": args.ticks, "seed": args.seed,
+                       "results": results}, file, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
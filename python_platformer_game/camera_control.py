@@ -0,0 +1,129 @@
+"""
+Camera following the player with a deadzone, kept inside the map
+
+The player moves about a box in the middle of the screen without the
+camera following. Once they leave it the camera eases after them at a
+rate set in seconds, so it looks the same at any frame rate, and it
+stops at the edges of the map instead of showing what is past them.
+The camera is given whole-pixel positions only, so the tiles don't
+shimmer as it eases.
+"""
+import math
+
+from constants import TILE_SCALING
+
+# Size of the box in the middle of the screen the player moves in
+# without the camera following, in pixels
+DEADZONE_WIDTH = 160
+DEADZONE_HEIGHT = 120
+
+# Seconds the camera takes to close most of the way to where it
+# should be, 0 follows at once
+FOLLOW_TIME = 0.08
+
+# A move further than this, like a respawn or a teleport, is made at
+# once instead of sliding across the map
+SNAP_DISTANCE = 400
+
+
+class CameraController:
+    '''
+    Class moving an arcade camera after the player on the map the
+    simulation is on
+    '''
+    def __init__(self, camera):
+        self.camera = camera
+
+        # The map the limits were taken from, a new one puts the camera
+        # straight on the player
+        self.tile_map = None
+        self.max_x = 0
+        self.max_y = 0
+
+        # Where the camera eases to and the whole-pixel position last
+        # given to the camera
+        self.x = 0.0
+        self.y = 0.0
+        self.shown = None
+
+    def set_map(self, tile_map):
+        """
+        Take the far limits of the camera from the size of a map
+        """
+        self.tile_map = tile_map
+        width = tile_map.width * tile_map.tile_width * TILE_SCALING
+        height = tile_map.height * tile_map.tile_height * TILE_SCALING
+        self.max_x = max(width - self.camera.viewport_width, 0)
+        self.max_y = max(height - self.camera.viewport_height, 0)
+
+    def clamp(self, x, y):
+        """
+        Return a camera position moved inside the map
+        """
+        return (min(max(x, 0), self.max_x), min(max(y, 0), self.max_y))
+
+    def target(self, x, y):
+        """
+        Return where the camera should be to have a player at x, y in
+        the deadzone, moving it as little as it can
+        """
+        left = self.x + (self.camera.viewport_width - DEADZONE_WIDTH) / 2
+        bottom = self.y + (self.camera.viewport_height - DEADZONE_HEIGHT) / 2
+        target_x = self.x
+        target_y = self.y
+        if x < left:
+            target_x -= left - x
+        elif x > left + DEADZONE_WIDTH:
+            target_x += x - left - DEADZONE_WIDTH
+        if y < bottom:
+            target_y -= bottom - y
+        elif y > bottom + DEADZONE_HEIGHT:
+            target_y += y - bottom - DEADZONE_HEIGHT
+        return self.clamp(target_x, target_y)
+
+    def snap_to(self, x, y):
+        """
+        Put the camera straight on a player at x, y, centred
+        """
+        self.x, self.y = self.clamp(x - self.camera.viewport_width / 2,
+                                    y - self.camera.viewport_height / 2)
+        self.push()
+
+    def follow(self, tile_map, x, y, delta_time):
+        """
+        Ease the camera after a player at x, y for a frame of delta_time
+        seconds
+        """
+        if tile_map is not self.tile_map:
+            self.set_map(tile_map)
+            self.snap_to(x, y)
+            return
+
+        target_x, target_y = self.target(x, y)
+        if (abs(target_x - self.x) > SNAP_DISTANCE or
+                abs(target_y - self.y) > SNAP_DISTANCE or
+                FOLLOW_TIME <= 0):
+            self.x, self.y = target_x, target_y
+        else:
+            blend = 1 - math.exp(-delta_time / FOLLOW_TIME)
+            self.x += (target_x - self.x) * blend
+            self.y += (target_y - self.y) * blend
+        self.push()
+
+    def push(self):
+        """
+        Give the camera its new position if it is a different pixel
+        """
+        shown = (round(self.x), round(self.y))
+        if shown == self.shown:
+            return
+        self.shown = shown
+        self.camera.move_to(shown, 1.0)
+
+    def use(self):
+        """
+        Select the camera to draw with. This works out and sets its
+        projection every frame even when it didn't move, the background
+        and the HUD are drawn with the GUI camera in between.
+        """
+        self.camera.use()
@@ -0,0 +1,294 @@
+"""
+Chunked level format for maps too big to load all at once
+
+A chunked level splits every tile layer of a map into square chunks of
+tiles that can be read one at a time. The file starts with a header
+and a JSON block holding the layer order, the object layers, the image
+of each used tile and a hash of the files it was made from, then a
+table with the offset of every chunk of every tile layer (0 for an
+empty chunk), then the chunks themselves as packed 16 bit tile ids (32
+bit if the map uses bigger ids), one row of the chunk after another.
+
+Usage: python chunks.py MAP.tmx [OUTPUT] [--chunk-size N]
+"""
+import argparse
+import hashlib
+import json
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from pathlib import Path
+from xml.etree import ElementTree
+
+import pytiled_parser
+
+from triggers import object_to_dict
+
+MAGIC = b"PLCK"
+VERSION = 3
+
+# magic, version, chunk size, width, height, tile width, tile height,
+# bytes per tile id, length of the JSON block
+HEADER = struct.Struct("<4sHHIIHHBxI")
+
+# Array type codes for the two tile id sizes
+TILE_ID_TYPES = {2: "H", 4: "I"}
+
+# Tiles along each side of a chunk
+CHUNK_SIZE = 16
+
+# Tiled keeps the flip flags in the top bits of a tile id
+TILE_ID_MASK = 0x1FFFFFFF
+
+
+def level_chunk_name(level):
+    '''
+    Function to find the chunked file for a level
+    '''
+    return f"map1_level_{level}.chunks"
+
+
+def file_hash(filename):
+    '''
+    Function to hash a file, used to tell when a level file is out of date
+    '''
+    with open(filename, "rb") as file:
+        return hashlib.sha1(file.read()).hexdigest()
+
+
+def source_files(map_file):
+    '''
+    Function to list a map and the tileset files it uses
+    '''
+    map_dir = os.path.dirname(os.path.abspath(map_file))
+    sources = [os.path.abspath(map_file)]
+    for tileset in ElementTree.parse(map_file).getroot().iter("tileset"):
+        if "source" in tileset.attrib:
+            sources.append(os.path.normpath(
+                os.path.join(map_dir, tileset.attrib["source"])))
+    return sources
+
+
+def all_layers(layers):
+    '''
+    Function to list the layers of a map, taking layer groups apart
+    '''
+    for layer in layers:
+        if isinstance(layer, pytiled_parser.LayerGroup):
+            yield from all_layers(layer.layers)
+        else:
+            yield layer
+
+
+def tile_image(tiled_map, gid):
+    '''
+    Function to find the image file of a tile id
+    '''
+    tileset = None
+    for firstgid in sorted(tiled_map.tilesets):
+        if firstgid <= gid:
+            tileset = tiled_map.tilesets[firstgid]
+    if tileset is None or not tileset.tiles:
+        raise ValueError(f"Tile {gid} isn't in a collection of images")
+    tile = tileset.tiles.get(gid - tileset.firstgid)
+    if tile is None or tile.image is None:
+        raise ValueError(f"Tile {gid} has no image")
+    return tile.image
+
+
+def write_chunked_level(map_file, output, chunk_size=CHUNK_SIZE):
+    '''
+    Function to split a TMX map into a chunked level file
+    '''
+    tiled_map = pytiled_parser.parse_map(Path(map_file))
+    map_dir = os.path.dirname(os.path.abspath(map_file))
+    width, height = tiled_map.map_size
+    columns = math.ceil(width / chunk_size)
+    rows = math.ceil(height / chunk_size)
+
+    layers = []
+    tile_layers = []
+    used = set()
+    for layer in all_layers(tiled_map.layers):
+        if isinstance(layer, pytiled_parser.TileLayer):
+            tile_layers.append(layer)
+            layers.append({"name": layer.name, "kind": "tiles"})
+            for row in layer.data:
+                used.update(gid & TILE_ID_MASK for gid in row)
+        elif isinstance(layer, pytiled_parser.ObjectLayer):
+            objects = [object_to_dict(tiled_object)
+                       for tiled_object in layer.tiled_objects]
+            layers.append({"name": layer.name, "kind": "objects",
+                           "objects": objects})
+            used.update(tiled_object["gid"] & TILE_ID_MASK
+                        for tiled_object in objects if tiled_object["gid"])
+    used.discard(0)
+
+    tiles = {}
+    for gid in sorted(used):
+        image = tile_image(tiled_map, gid)
+        image = os.path.relpath(image, map_dir)
+        tiles[str(gid)] = image.replace(os.sep, "/")
+
+    background_color = None
+    if tiled_map.background_color:
+        background_color = list(tiled_map.background_color)
+
+    sources = {}
+    for filename in source_files(map_file):
+        sources[os.path.relpath(filename, map_dir).replace(os.sep, "/")] = \
+            file_hash(filename)
+
+    meta = json.dumps({"layers": layers, "tiles": tiles,
+                       "background_color": background_color,
+                       "sources": sources},
+                      default=str).encode()
+
+    # Use 16 bit tile ids unless the map has bigger ones
+    id_size = 2
+    for layer in tile_layers:
+        if any(gid > 0xFFFF for row in layer.data for gid in row):
+            id_size = 4
+    id_type = TILE_ID_TYPES[id_size]
+
+    # Chunk data starts after the header, JSON and offset table
+    offset = HEADER.size + len(meta) + 4 * len(tile_layers) * rows * columns
+    table = array("I")
+    chunks = []
+    for layer in tile_layers:
+        for chunk_y in range(rows):
+            for chunk_x in range(columns):
+                block = array(id_type, [0] * (chunk_size * chunk_size))
+                for y in range(chunk_size):
+                    row = chunk_y * chunk_size + y
+                    if row >= height:
+                        break
+                    start = chunk_x * chunk_size
+                    line = layer.data[row][start:start + chunk_size]
+                    block[y * chunk_size:y * chunk_size + len(line)] = \
+                        array(id_type, line)
+                if not any(block):
+                    table.append(0)
+                    continue
+                table.append(offset)
+                data = block.tobytes()
+                chunks.append(data)
+                offset += len(data)
+
+    with open(output, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, chunk_size, width, height,
+                               tiled_map.tile_size.width,
+                               tiled_map.tile_size.height, id_size,
+                               len(meta)))
+        file.write(meta)
+        file.write(table.tobytes())
+        for data in chunks:
+            file.write(data)
+
+
+class ChunkedMap:
+    '''
+    Class that reads a chunked level file, a chunk only when it's asked
+    for. The file stays mapped until close() is called, it can also be
+    used in a with statement.
+    '''
+    def __init__(self, filename):
+        self.filename = filename
+        self.directory = os.path.dirname(os.path.abspath(filename))
+        with open(filename, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_header()
+        except Exception:
+            self.close()
+            raise
+
+    def _read_header(self):
+        if len(self.data) < HEADER.size:
+            raise ValueError(f"{self.filename} is not a chunked level")
+        (magic, version, self.chunk_size, self.width, self.height,
+         self.tile_width, self.tile_height, self.id_size,
+         meta_length) = HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"{self.filename} is not a chunked level")
+        if version != VERSION:
+            raise ValueError(f"Unsupported chunked level version {version}")
+
+        meta = json.loads(self.data[HEADER.size:HEADER.size + meta_length])
+        self.layers = meta["layers"]
+        self.tile_layer_names = [layer["name"] for layer in self.layers
+                                 if layer["kind"] == "tiles"]
+        self.tiles = {int(gid): os.path.join(self.directory, image)
+                      for gid, image in meta["tiles"].items()}
+        self.background_color = None
+        if meta["background_color"]:
+            self.background_color = tuple(meta["background_color"])
+        self.sources = meta["sources"]
+
+        self.columns = math.ceil(self.width / self.chunk_size)
+        self.rows = math.ceil(self.height / self.chunk_size)
+        self.table_offset = HEADER.size + meta_length
+
+    def close(self):
+        """
+        Unmap the file, no chunks can be read after this
+        """
+        if not self.data.closed:
+            self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def chunk_tiles(self, layer_index, chunk_x, chunk_y):
+        """
+        Return the tile ids of one chunk of a tile layer, or None if the
+        chunk is empty. Rows go from the top of the map down.
+        """
+        index = (layer_index * self.rows + chunk_y) * self.columns + chunk_x
+        offset, = struct.unpack_from("<I", self.data,
+                                     self.table_offset + 4 * index)
+        if not offset:
+            return None
+        tiles = array(TILE_ID_TYPES[self.id_size])
+        tiles.frombytes(self.data[offset:offset + self.id_size *
+                                  self.chunk_size * self.chunk_size])
+        return tiles
+
+    def is_stale(self):
+        """
+        Return True if a file the level was made from has changed since.
+        Sources that aren't there any more don't count, the level file
+        is then the only copy of the map.
+        """
+        for name, digest in self.sources.items():
+            filename = os.path.join(self.directory, name)
+            if os.path.exists(filename) and file_hash(filename) != digest:
+                return True
+        return False
+
+
+def main(argv=None):
+    """
+    Split a map into a chunked level file
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument("map")
+    parser.add_argument("output", nargs="?")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.map)[0] + ".chunks"
+    write_chunked_level(args.map, output, args.chunk_size)
+    print(f"Wrote {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
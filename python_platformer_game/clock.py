@@ -0,0 +1,53 @@
+"""
+Integer game clock, so level times are exact and the same on every run
+"""
+
+# Simulation steps in one second of game time
+TICKS_PER_SECOND = 60
+
+
+def format_hundredths(hundredths):
+    '''
+    Function to turn a time in hundredths of a second into the
+    minutes:seconds:hundredths text shown on the HUD
+    '''
+    minutes, hundredths = divmod(hundredths, 6000)
+    seconds, hundredths = divmod(hundredths, 100)
+    return f"{minutes:02d}:{seconds:02d}:{hundredths:02d}"
+
+
+class GameClock:
+    '''
+    Class counting the time of a level in ticks. The HUD text is only
+    made again when the hundredths it shows change.
+    '''
+    def __init__(self, ticks_per_second=TICKS_PER_SECOND):
+        self.ticks_per_second = ticks_per_second
+        self.ticks = 0
+        self.hundredths = 0
+        self.text = format_hundredths(0)
+
+    def reset(self):
+        self.ticks = 0
+        self.hundredths = 0
+        self.text = format_hundredths(0)
+
+    def advance(self, ticks=1):
+        """
+        Move the clock on by a number of ticks
+        """
+        self.set(self.ticks + ticks)
+
+    def set(self, ticks):
+        """
+        Put the clock at a number of ticks
+        """
+        self.ticks = ticks
+        hundredths = ticks * 100 // self.ticks_per_second
+        if hundredths != self.hundredths:
+            self.hundredths = hundredths
+            self.text = format_hundredths(hundredths)
+
+    @property
+    def seconds(self):
+        return self.ticks / self.ticks_per_second
@@ -0,0 +1,101 @@
+"""
+Store of the coins of a level, collected ones are hidden instead of
+taken out of their sprite list
+
+Every coin has an index into a fixed list of where the coins are and a
+bit in a mask of the ones collected since the level was reset. Picking
+a coin up sets its bit and makes its sprite see-through, so neither
+that nor putting every coin back changes the sprite list or a spatial
+hash. The store's own grid of coin positions finds the coins the
+player is touching, skipping the collected ones by their bit.
+"""
+import arcade
+
+from collisions import BROKER_CELL_SIZE
+from grid import UniformGrid
+
+
+class CoinStore:
+    '''
+    Class keeping the coins of a level by index, with the sprites of the
+    ones loaded and a mask of the ones collected
+    '''
+    def __init__(self, positions, reach, cell_size=BROKER_CELL_SIZE):
+        # Centre of every coin, by index
+        self.positions = list(positions)
+        self.count = len(self.positions)
+
+        # Furthest a coin reaches from its centre, so a query looks at
+        # the cells of coins that might touch the edge of a sprite
+        self.reach = reach
+
+        # Indices of the coins by the cell their centre is in
+        self.grid = UniformGrid(cell_size)
+        for index, (x, y) in enumerate(self.positions):
+            self.grid.add(index, x, y, x, y)
+
+        # Index -> sprite of the coins that are loaded
+        self.sprites = {}
+
+        # Bit 1 << index is set for each coin collected
+        self.collected = 0
+
+    def add_sprite(self, sprite):
+        """
+        Take the sprite of a coin, from its coin_index property, and show
+        it or not
+        """
+        index = sprite.properties["coin_index"]
+        self.sprites[index] = sprite
+        sprite.visible = not self.collected >> index & 1
+
+    def remove_sprite(self, sprite):
+        """
+        Forget the sprite of a coin whose chunk was unloaded
+        """
+        self.sprites.pop(sprite.properties["coin_index"], None)
+
+    def touching(self, sprite):
+        """
+        Return the coins not yet collected that are touching a sprite
+        """
+        hits = []
+        reach = self.reach
+        for index in self.grid.query(sprite.left - reach,
+                                     sprite.bottom - reach,
+                                     sprite.right + reach,
+                                     sprite.top + reach):
+            if self.collected >> index & 1:
+                continue
+            coin = self.sprites.get(index)
+            if coin and arcade.check_for_collision(sprite, coin):
+                hits.append(coin)
+        return hits
+
+    def collect(self, coin):
+        """
+        Mark a coin collected and hide it
+        """
+        self.collected |= 1 << coin.properties["coin_index"]
+        coin.visible = False
+
+    def restore(self, collected):
+        """
+        Show and hide coins so the ones collected are those of a mask
+        from the collected attribute. Only coins whose bit changed are
+        looked at.
+        """
+        changed = self.collected ^ collected
+        self.collected = collected
+        while changed:
+            bit = changed & -changed
+            changed ^= bit
+            coin = self.sprites.get(bit.bit_length() - 1)
+            if coin:
+                coin.visible = not collected & bit
+
+    def reset(self):
+        """
+        Put every coin back
+        """
+        self.restore(0)
@@ -0,0 +1,157 @@
+"""
+Collision broker that finds everything touching the player in one query,
+and a spatial hash for sprites that move
+"""
+import arcade
+
+from grid import UniformGrid
+
+# Size of a cell in the broker's grid, in game pixels
+BROKER_CELL_SIZE = 128
+
+
+class CollisionBroker:
+    '''
+    Class keeping the sprites of several layers in one grid. A query
+    looks at the cells under a sprite once and returns every hit tagged
+    with the layer it came from.
+    '''
+    def __init__(self, cell_size=BROKER_CELL_SIZE):
+        # (tag, sprite) of the sprites of static layers
+        self.grid = UniformGrid(cell_size)
+
+        # Layers that move, checked through their own spatial hash
+        self.dynamic_layers = []
+
+    def add_layer(self, tag, sprite_list, dynamic=False):
+        """
+        Register a layer. Static layers are copied into the grid, dynamic
+        ones are looked up through the sprite list when queried.
+        """
+        if dynamic:
+            self.dynamic_layers.append((tag, sprite_list))
+            return
+        for sprite in sprite_list:
+            self.add_sprite(tag, sprite)
+
+    def add_sprite(self, tag, sprite):
+        self.grid.add((tag, sprite), sprite.left, sprite.bottom,
+                      sprite.right, sprite.top)
+
+    def remove_sprite(self, tag, sprite):
+        self.grid.remove((tag, sprite), sprite.left, sprite.bottom,
+                         sprite.right, sprite.top)
+
+    def query(self, sprite):
+        """
+        Return a list of (tag, sprite) for everything touching a sprite
+        """
+        hits = [(tag, other) for tag, other in self.grid.query(
+                    sprite.left, sprite.bottom, sprite.right, sprite.top)
+                if arcade.check_for_collision(sprite, other)]
+
+        for tag, sprite_list in self.dynamic_layers:
+            if sprite_list.spatial_hash:
+                nearby = sprite_list.spatial_hash.get_objects_for_box(sprite)
+            else:
+                nearby = sprite_list
+            for other in nearby:
+                if other is not sprite and arcade.check_for_collision(
+                        sprite, other):
+                    hits.append((tag, other))
+        return hits
+
+
+class IncrementalSpatialHash:
+    '''
+    Class that can stand in for the spatial hash of an arcade sprite
+    list. Arcade takes a sprite out of its buckets and puts it back on
+    every move, this only changes the buckets when the sprite crosses
+    into another cell.
+    '''
+    def __init__(self, cell_size=BROKER_CELL_SIZE):
+        self.cell_size = cell_size
+
+        # (cell x, cell y) -> sprites, and the cells each sprite is in
+        self.contents = {}
+        self.cells_for_sprite = {}
+
+        # Sprites taken out that may be put straight back. Moving a
+        # sprite removes and inserts it, so its buckets are only left
+        # once it's known to be gone.
+        self.removed = set()
+
+    def _cells(self, sprite):
+        # Cells are worked out the same way as arcade's hash
+        size = self.cell_size
+        return (int(int(sprite.left) / size), int(int(sprite.bottom) / size),
+                int(int(sprite.right) / size), int(int(sprite.top) / size))
+
+    def _add(self, sprite, cells):
+        min_x, min_y, max_x, max_y = cells
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                self.contents.setdefault((x, y), []).append(sprite)
+
+    def _remove(self, sprite, cells):
+        min_x, min_y, max_x, max_y = cells
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                self.contents[(x, y)].remove(sprite)
+
+    def _purge(self):
+        for sprite in self.removed:
+            self._remove(sprite, self.cells_for_sprite.pop(sprite))
+        self.removed.clear()
+
+    def reset(self):
+        self.contents = {}
+        self.cells_for_sprite = {}
+        self.removed = set()
+
+    def insert_object_for_box(self, sprite):
+        cells = self._cells(sprite)
+        self.removed.discard(sprite)
+        old_cells = self.cells_for_sprite.get(sprite)
+        if cells == old_cells:
+            return
+        if old_cells is not None:
+            self._remove(sprite, old_cells)
+        self._add(sprite, cells)
+        self.cells_for_sprite[sprite] = cells
+
+    def remove_object(self, sprite):
+        if sprite in self.cells_for_sprite:
+            self.removed.add(sprite)
+
+    def get_objects_for_box(self, check_object):
+        """
+        Return the set of sprites in the cells a sprite covers
+        """
+        if self.removed:
+            self._purge()
+        found = set()
+        min_x, min_y, max_x, max_y = self._cells(check_object)
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                found.update(self.contents.get((x, y), ()))
+        return found
+
+    def get_objects_for_point(self, check_point):
+        if self.removed:
+            self._purge()
+        size = self.cell_size
+        return list(self.contents.get((int(check_point[0] / size),
+                                       int(check_point[1] / size)), ()))
+
+
+def use_incremental_hash(sprite_list, cell_size=BROKER_CELL_SIZE):
+    '''
+    Function to give a hashed sprite list an incremental spatial hash.
+    SpriteList.clear() puts arcade's own hash back, so call this again
+    after clearing.
+    '''
+    sprite_list.spatial_hash = IncrementalSpatialHash(cell_size)
+    for sprite in sprite_list:
+        sprite_list.spatial_hash.insert_object_for_box(sprite)
+    return sprite_list
@@ -0,0 +1,63 @@
+"""
+Compile the TMX maps of the game into chunked level files
+
+The game loads a level from its compiled file when there is one that is
+up to date, which is much quicker than parsing the TMX and its tileset.
+Maps whose compiled file is already up to date are skipped.
+
+Usage: python compile_levels.py [MAP.tmx ...] [--force]
+"""
+import argparse
+import glob
+import os
+import sys
+
+from chunks import ChunkedMap, write_chunked_level
+
+
+def compiled_name(map_file):
+    '''
+    Function to find the compiled file for a map
+    '''
+    return os.path.splitext(map_file)[0] + ".chunks"
+
+
+def is_up_to_date(map_file):
+    '''
+    Function to check if a map's compiled file matches the map
+    '''
+    output = compiled_name(map_file)
+    if not os.path.exists(output):
+        return False
+    try:
+        with ChunkedMap(output) as chunked_map:
+            return not chunked_map.is_stale()
+    except ValueError:
+        # Written by another version of the format
+        return False
+
+
+def main(argv=None):
+    """
+    Compile every map given, or every level map in this directory
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument("maps", nargs="*")
+    parser.add_argument("--force", action="store_true",
+                        help="compile maps that are already up to date")
+    args = parser.parse_args(argv)
+
+    maps = args.maps or sorted(glob.glob("map1_level_*.tmx"))
+    for map_file in maps:
+        output = compiled_name(map_file)
+        if not args.force and is_up_to_date(map_file):
+            print(f"{output} is up to date")
+            continue
+        write_chunked_level(map_file, output)
+        print(f"Wrote {output} ({os.path.getsize(output)} bytes)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
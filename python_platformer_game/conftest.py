@@ -0,0 +1,236 @@
+"""
+Fixtures shared by the tests, which run from this folder with no window
+unless a test makes a hidden one
+
+The shipped maps need tile images that aren't in every checkout, tests
+of the game rules play small levels written by the test_levels fixture
+instead.
+"""
+import os
+import shutil
+
+import pyglet
+import pytest
+from PIL import Image
+
+pyglet.options["headless"] = True
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Size of the test levels, in tiles
+TEST_MAP_WIDTH = 40
+TEST_MAP_HEIGHT = 10
+TEST_TILE_SIZE = 21
+
+# Colour of the image of each tile of the test levels, by tile id
+TEST_TILES = {
+    "ground": (120, 80, 40),
+    "coin": (250, 210, 40),
+    "spikes": (200, 40, 40),
+    "ladder": (150, 110, 60),
+    "enemy": (40, 160, 40),
+    "platform": (90, 90, 110),
+}
+
+
+def tiles_present():
+    '''
+    Function to check the tile images the maps use are in this checkout
+    '''
+    with open(os.path.join(HERE, "map1_level_1.tmx")) as file:
+        text = file.read()
+    start = text.index('source="Tiles/') + len('source="')
+    end = text.index('"', start)
+    return os.path.exists(os.path.join(HERE, text[start:end]))
+
+
+@pytest.fixture
+def game_dir(monkeypatch):
+    '''
+    Fixture running a test from the game's folder, skipped when the maps
+    can't be loaded
+    '''
+    monkeypatch.chdir(HERE)
+    if not tiles_present():
+        pytest.skip("the tile images of the maps aren't in this checkout")
+    return HERE
+
+
+def _test_tile(name):
+    # Tile gid of an image of the test tileset
+    return list(TEST_TILES).index(name) + 1
+
+
+def _test_layer(layer_id, name, tiles):
+    rows = []
+    for row in range(TEST_MAP_HEIGHT):
+        rows.append(",".join(str(tiles.get((column, row), 0))
+                             for column in range(TEST_MAP_WIDTH)))
+    return (f' <layer id="{layer_id}" name="{name}" '
+            f'width="{TEST_MAP_WIDTH}" height="{TEST_MAP_HEIGHT}">\n'
+            f'  <data encoding="csv">\n' + ",\n".join(rows) +
+            '\n  </data>\n </layer>\n')
+
+
+def _test_object(object_id, x, y, gid=None, width=0, height=0,
+                 properties=None):
+    text = f'  <object id="{object_id}" x="{x}" y="{y}"'
+    if gid:
+        text += f' gid="{gid}" width="{width}" height="{height}"'
+    elif width or height:
+        text += f' width="{width}" height="{height}"'
+    if not properties:
+        return text + '/>\n'
+    text += '>\n   <properties>\n'
+    for name, value in properties.items():
+        text += f'    <property name="{name}" value="{value}"/>\n'
+    text += '   </properties>\n'
+    if not gid and not width and not height:
+        text += '   <point/>\n'
+    return text + '  </object>\n'
+
+
+def make_test_level():
+    '''
+    Function to make the TMX text of a small level. The player spawns
+    near the left wall with spikes behind them, eleven coins on the
+    floor ahead and a ladder, an enemy and moving platforms about.
+    '''
+    size = TEST_TILE_SIZE
+    bottom = TEST_MAP_HEIGHT - 1
+    ground = _test_tile("ground")
+    platforms = {(column, bottom): ground
+                 for column in range(TEST_MAP_WIDTH)}
+    for row in range(bottom):
+        platforms[(0, row)] = ground
+        platforms[(TEST_MAP_WIDTH - 1, row)] = ground
+    coins = {(column, bottom - 1): _test_tile("coin")
+             for column in range(10, 21)}
+    coins[(22, bottom - 4)] = _test_tile("coin")
+    spikes = {(1, bottom - 1): _test_tile("spikes")}
+
+    tileset = (' <tileset firstgid="1" name="test_tiles" '
+               f'tilewidth="{size}" tileheight="{size}" '
+               f'tilecount="{len(TEST_TILES)}" columns="0">\n')
+    for tile_id, name in enumerate(TEST_TILES):
+        tileset += (f'  <tile id="{tile_id}">\n'
+                    f'   <image width="{size}" height="{size}" '
+                    f'source="Tiles/test_{name}.png"/>\n  </tile>\n')
+    tileset += ' </tileset>\n'
+
+    enemy = _test_tile("enemy")
+    platform = _test_tile("platform")
+    ladder = _test_tile("ladder")
+    enemies = (' <objectgroup id="4" name="Enemies">\n' +
+               _test_object(1, 28 * size, bottom * size, enemy, size, size,
+                            {"boundary_left": 756, "boundary_right": 1134,
+                             "change_x": 2}) +
+               ' </objectgroup>\n')
+    moving = (' <objectgroup id="5" name="Moving Platform">\n' +
+              _test_object(2, 10 * size, 4 * size, platform, size, size,
+                           {"boundary_left": 300, "boundary_right": 700,
+                            "change_x": 1.5}) +
+              _test_object(3, 30 * size, 5 * size, platform, size, size,
+                           {"boundary_bottom": 100, "boundary_top": 250,
+                            "change_y": 1}) +
+              ' </objectgroup>\n')
+    ladders = ' <objectgroup id="6" name="Ladders">\n'
+    for index, row in enumerate(range(bottom - 4, bottom)):
+        ladders += _test_object(4 + index, 6 * size, (row + 1) * size,
+                                ladder, size, size)
+    ladders += ' </objectgroup>\n'
+    triggers = (' <objectgroup id="7" name="Triggers" visible="0">\n' +
+                _test_object(10, 4 * size, bottom * size,
+                             properties={"spawn_x": 126, "spawn_y": 80}) +
+                _test_object(11, 12 * size, 0, width=5 * size,
+                             height=TEST_MAP_HEIGHT * size,
+                             properties={"background": "cave"}) +
+                ' </objectgroup>\n')
+
+    return ('<?xml version="1.0" encoding="UTF-8"?>\n'
+            '<map version="1.8" tiledversion="1.8.2" '
+            'orientation="orthogonal" renderorder="right-down" '
+            f'width="{TEST_MAP_WIDTH}" height="{TEST_MAP_HEIGHT}" '
+            f'tilewidth="{size}" tileheight="{size}" infinite="0" '
+            'nextlayerid="9" nextobjectid="12">\n' + tileset +
+            _test_layer(8, "Background", {}) +
+            _test_layer(1, "Platforms", platforms) +
+            _test_layer(2, "Coins", coins) +
+            _test_layer(3, "Don't Touch", spikes) +
+            enemies + moving + ladders + triggers + '</map>\n')
+
+
+@pytest.fixture
+def test_levels(tmp_path, monkeypatch):
+    '''
+    Fixture running a test from a folder holding a small test level in
+    place of each shipped one, with its tile images and the player's
+    '''
+    tiles = tmp_path / "Tiles"
+    tiles.mkdir()
+    for name, colour in TEST_TILES.items():
+        Image.new("RGBA", (TEST_TILE_SIZE, TEST_TILE_SIZE),
+                  colour).save(tiles / f"test_{name}.png")
+    shutil.copytree(os.path.join(HERE, "animations"),
+                    tmp_path / "animations")
+    text = make_test_level()
+    for level in (1, 2, 3):
+        (tmp_path / f"map1_level_{level}.tmx").write_text(text)
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _scripted_keys(tick):
+    # Back into the spikes, then right past the ladder jumping now and
+    # then, over the coins and into the enemy until every test level
+    # is done
+    from simulation import INPUT_LEFT, INPUT_RIGHT, INPUT_UP
+    if tick < 40:
+        return INPUT_LEFT
+    if tick < 100 and tick % 20 < 8:
+        return INPUT_RIGHT | INPUT_UP
+    return INPUT_RIGHT
+
+
+def _game_state(simulation):
+    player = simulation.player_sprite
+    level = simulation.current_level
+    return {
+        "level": simulation.level,
+        "tick": simulation.tick,
+        "score": simulation.score,
+        "death": simulation.death,
+        "clock_ticks": simulation.clock.ticks,
+        "split_ticks": dict(simulation.split_ticks),
+        "game_complete": simulation.game_complete,
+        "keys": simulation.keys,
+        "jump_needs_reset": simulation.jump_needs_reset,
+        "background": simulation.background,
+        "player": (tuple(player.position), player.change_x,
+                   player.change_y, player.character_facedirection),
+        "collected": level.coins.collected,
+        # Every mover, near the player or not, from its arrays
+        "movers": {name: [tuple(float(value) for value in values)
+                          for values in zip(movers.x, movers.y,
+                                            movers.change_x,
+                                            movers.change_y)]
+                   for name, movers in level.movers.items()},
+    }
+
+
+@pytest.fixture
+def game_state():
+    '''
+    Fixture giving a function that returns what a simulation's state
+    is, to compare two runs by
+    '''
+    return _game_state
+
+
+@pytest.fixture
+def scripted_keys():
+    '''
+    Fixture giving the input mask to play on each tick of a scripted
+    run through the test levels, which finishes them all in 600 ticks
+    '''
+    return _scripted_keys
@@ -0,0 +1,45 @@
+"""
+Constants shared by the game and its level loading code
+"""
+
+# Constants
+SCREEN_WIDTH = 1000
+SCREEN_HEIGHT = 650
+SCREEN_TITLE = "Platform"
+CHARACTER_SCALING = 1.5
+TILE_SCALING = 1.5
+COIN_SCALING = 0.5
+MOVEMENT_SPEED = 5
+PLAYER_MOVEMENT_SPEED = 5
+GRAVITY = 0.5
+PLAYER_JUMP_SPEED = 8
+
+# Where the player starts when a map doesn't have a spawn trigger
+PLAYER_START_X = 241
+PLAYER_START_Y = 96
+
+# Coins collected on each level to move on to the next, a level that
+# isn't listed needs every coin it has
+COINS_NEEDED = {1: 11, 2: 11, 3: 11}
+
+RIGHTFACING = 0
+LEFTFACING = 1
+
+# Layer names
+LAYER_NAME_PLATORMS = "Platforms"
+LAYER_NAME_COINS = "Coins"
+LAYER_NAME_BACKGROUND = "Background"
+LAYER_NAME_DONT_TOUCH = "Don't Touch"
+LAYER_NAME_ENEMIES = "Enemies"
+LAYER_NAME_MOVING_PLATFORM = "Moving Platform"
+LAYER_NAME_LADDERS = "Ladders"
+LAYER_NAME_TELEPORTER = "Teleport"
+LAYER_NAME_TELEPORTER_BACK = "Teleport Back"
+LAYER_NAME_PLAYER = "Player"
+
+# Background images, loaded once when the game starts
+BACKGROUND_FILES = {
+    "sky": "Backgrounds/backgrounds.png",
+    "cave": "Backgrounds/cave.png",
+}
+DEFAULT_BACKGROUND = "sky"
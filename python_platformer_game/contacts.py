@@ -0,0 +1,72 @@
+"""
+What the player is touching, asked of the physics engine once a tick
+
+The physics engine runs a collision query against the walls, platforms
+or ladders every time can_jump() or is_on_ladder() is called, and a
+step asks the same questions several times while nothing has moved.
+"""
+
+# How far below the player a floor lets them jump when up is pressed
+JUMP_DISTANCE = 10
+
+
+class PlayerContacts:
+    '''
+    Class keeping the answers of the physics engine's contact queries
+    until the next physics step. They are also asked again once the
+    player is somewhere else, as after a teleport or a respawn.
+    '''
+    def __init__(self, physics_engine):
+        self.physics_engine = physics_engine
+        self.player = physics_engine.player_sprite
+
+        # Where the player was when the answers were taken, None when
+        # there are none
+        self.position = None
+        self._grounded = None
+        self._on_ladder = None
+        self._jumpable = None
+
+    def invalidate(self):
+        """
+        Forget the answers, called whenever the player or the things
+        around them have moved
+        """
+        self.position = None
+
+    def _refresh(self):
+        position = self.player.position
+        if position != self.position:
+            self.position = position
+            self._grounded = None
+            self._on_ladder = None
+            self._jumpable = None
+
+    def grounded(self):
+        """
+        Return whether there is a floor just under the player
+        """
+        self._refresh()
+        if self._grounded is None:
+            self._grounded = self.physics_engine.can_jump()
+        return self._grounded
+
+    def on_ladder(self):
+        """
+        Return whether the player is touching a ladder
+        """
+        self._refresh()
+        if self._on_ladder is None:
+            self._on_ladder = self.physics_engine.is_on_ladder()
+        return self._on_ladder
+
+    def jumpable(self):
+        """
+        Return whether there is a floor close enough under the player
+        to jump from
+        """
+        self._refresh()
+        if self._jumpable is None:
+            self._jumpable = self.physics_engine.can_jump(
+                y_distance=JUMP_DISTANCE)
+        return self._jumpable
@@ -0,0 +1,57 @@
+"""
+Uniform grid bucketing things by the square cells their boxes cover,
+shared by the collision broker, the trigger index and the coin store
+"""
+
+
+class UniformGrid:
+    '''
+    Class keeping items in the cells of a grid, so finding the ones near
+    a box only looks at the cells it covers
+    '''
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+
+        # (cell x, cell y) -> items in the cell
+        self.cells = {}
+
+    def cell_range(self, left, bottom, right, top):
+        """
+        Yield the (cell x, cell y) of every cell a box covers
+        """
+        size = self.cell_size
+        rows = range(int(bottom // size), int(top // size) + 1)
+        for x in range(int(left // size), int(right // size) + 1):
+            for y in rows:
+                yield x, y
+
+    def add(self, item, left, bottom, right, top):
+        """
+        Put an item in every cell its box covers
+        """
+        for cell in self.cell_range(left, bottom, right, top):
+            self.cells.setdefault(cell, []).append(item)
+
+    def remove(self, item, left, bottom, right, top):
+        """
+        Take an item out of the cells its box covers
+        """
+        for cell in self.cell_range(left, bottom, right, top):
+            items = self.cells.get(cell)
+            if items and item in items:
+                items.remove(item)
+
+    def query(self, left, bottom, right, top):
+        """
+        Return the items in the cells a box covers, each one only once,
+        in the order they are found
+        """
+        found = []
+        seen = set()
+        cells = self.cells
+        for cell in self.cell_range(left, bottom, right, top):
+            for item in cells.get(cell, ()):
+                if item not in seen:
+                    seen.add(item)
+                    found.append(item)
+        return found
@@ -0,0 +1,124 @@
+"""
+Score, death count and timer drawn on top of the game
+"""
+import arcade
+import pyglet
+
+HUD_FONT = "Kenney Pixel Square"
+HUD_FONT_SIZE = 18
+
+# How far the white text sits from its black shadow
+SHADOW_OFFSET = 3
+
+# Gap between two lines of the HUD
+LINE_HEIGHT = 30
+
+# Text of the profiler overlay
+OVERLAY_FONT_SIZE = 10
+OVERLAY_WIDTH = 420
+
+# Frames between two refreshes of the profiler overlay
+OVERLAY_REFRESH_FRAMES = 30
+
+
+class HudLine:
+    '''
+    Class for one line of HUD text and its shadow
+    '''
+    def __init__(self, template, x, y, batch, shadow_group, text_group):
+
+        # Format used to turn the value into the displayed text
+        self.template = template
+        self.value = None
+
+        self.shadow = pyglet.text.Label(
+            "", font_name=HUD_FONT, font_size=HUD_FONT_SIZE,
+            color=arcade.get_four_byte_color(arcade.csscolor.BLACK),
+            x=x, y=y, batch=batch, group=shadow_group)
+        self.label = pyglet.text.Label(
+            "", font_name=HUD_FONT, font_size=HUD_FONT_SIZE,
+            color=arcade.get_four_byte_color(arcade.csscolor.WHITE),
+            x=x + SHADOW_OFFSET, y=y + SHADOW_OFFSET, batch=batch,
+            group=text_group)
+
+    def set(self, value):
+        """
+        Show a new value, the text is only laid out again if it changed
+        """
+        if value == self.value:
+            return
+        self.value = value
+        text = self.template.format(value)
+        self.shadow.text = text
+        self.label.text = text
+
+
+class Hud:
+    '''
+    Class that keeps the HUD text between frames and draws it in one batch
+    '''
+    def __init__(self, x=10, y=10):
+        self.batch = pyglet.graphics.Batch()
+
+        # Shadows are drawn first so the white text sits on top
+        groups = (self.batch, pyglet.graphics.Group(order=0),
+                  pyglet.graphics.Group(order=1))
+        self.score = HudLine("Score: {}", x, y, *groups)
+        self.death = HudLine("Deaths: {}", x, y + LINE_HEIGHT, *groups)
+        self.time = HudLine("Time: {}", x, y + LINE_HEIGHT * 2, *groups)
+
+    def update(self, simulation):
+        """
+        Take the values to show from the simulation
+        """
+        self.score.set(simulation.score)
+        self.death.set(simulation.death)
+        self.time.set(simulation.output)
+
+    def draw(self):
+        # raw pyglet draw calls need this context helper inside arcade
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.batch.draw()
+
+
+class ProfileOverlay:
+    '''
+    Class that shows the rolling percentiles of every profiled phase
+    '''
+    def __init__(self, profiler, x, y):
+        self.profiler = profiler
+        self.visible = False
+        self.frames = 0
+        self.batch = pyglet.graphics.Batch()
+        self.label = pyglet.text.Label(
+            "", font_name=HUD_FONT, font_size=OVERLAY_FONT_SIZE,
+            color=arcade.get_four_byte_color(arcade.csscolor.WHITE),
+            x=x, y=y, width=OVERLAY_WIDTH, multiline=True,
+            anchor_y="top", batch=self.batch)
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.frames = 0
+
+    def update(self):
+        """
+        Lay the text out again every few frames, not on every one
+        """
+        if not self.visible:
+            return
+        self.frames -= 1
+        if self.frames > 0:
+            return
+        self.frames = OVERLAY_REFRESH_FRAMES
+
+        lines = ["phase            p50     p95     p99 ms"]
+        for name, entry in self.profiler.summary().items():
+            lines.append(f"{name:<14}{entry['p50']:7.2f} "
+                         f"{entry['p95']:7.2f} {entry['p99']:7.2f}")
+        self.label.text = "\n".join(lines)
+
+    def draw(self):
+        if not self.visible:
+            return
+        with arcade.get_window().ctx.pyglet_rendering():
+            self.batch.draw()
@@ -1,157 +1,51 @@
 """
 Platformer Game
 """
+import argparse
+
 import arcade
 import arcade.gui
 
-# Constants
-SCREEN_WIDTH = 1000
-SCREEN_HEIGHT = 650
-COINS_COLLECTED = 11
-SCREEN_TITLE = "Platform"
-CHARACTER_SCALING = 1.5
-TILE_SCALING = 1.5
-COIN_SCALING = 0.5
-MOVEMENT_SPEED = 5
-PLAYER_MOVEMENT_SPEED = 5
-GRAVITY = 0.5
-PLAYER_JUMP_SPEED = 8
-
-# Player coordinate constants
-PLAYER_START_X = 241
-PLAYER_START_Y = 96
-PLAYER_START_Y_THREE = 693
-PLAYER_TP_X = 267.75
-PLAYER_TP_Y = 688.25
-PLAYER_TP_X_BACK = 362
-PLAYER_TP_Y_BACK = 30.25
-
-RIGHTFACING = 0
-LEFTFACING = 1
-
-# Layer names
-LAYER_NAME_PLATORMS = "Platforms"
-LAYER_NAME_COINS = "Coins"
-LAYER_NAME_BACKGROUND = "Background"
-LAYER_NAME_DONT_TOUCH = "Don't Touch"
-LAYER_NAME_ENEMIES = "Enemies"
-LAYER_NAME_MOVING_PLATFORM = "Moving Platform"
-LAYER_NAME_LADDERS = "Ladders"
-LAYER_NAME_TELEPORTER = "Teleport"
-LAYER_NAME_TELEPORTER_BACK = "Teleport Back"
-LAYER_NAME_PLAYER = "Player"
+from constants import SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE
+from level_cache import LevelCache
+from replay import Recording
+from hud import Hud, ProfileOverlay
+from profiler import Profiler
+from textures import BackgroundRegistry, build_atlas
+from simulation import (Simulation, FIXED_DT, INPUT_UP, INPUT_DOWN,
+                        INPUT_LEFT, INPUT_RIGHT)
+from sounds import SoundManager, NULL_SOUND_MANAGER
+from snapshot import SnapshotRing, REWIND_INTERVAL
+from camera_control import CameraController
+
+# Most simulation steps run in one frame before time is dropped
+MAX_STEPS_PER_FRAME = 5
 
 # global variables
 total_time_display = 0
 total_death_display = 0
 
 
-def load_texture_pair(filename):
-    '''
-    Function to load a pair of mirror images for character animations
-    '''
-    return [
-        arcade.load_texture(filename),
-        arcade.load_texture(filename, flipped_horizontally=True),
-    ]
-
-
-class PlayerCharacter(arcade.Sprite):
-    '''
-    Class for animations used for player character
-    '''
-    def __init__(self):
-
-        super().__init__()
-
-        # Default to facing right
-        self.character_facedirection = RIGHTFACING
-
-        # Used for image sequences
-        self.cur_texture = 0
-        self.scale = CHARACTER_SCALING
-
-        self.jumping = False
-        self.climbing = False
-        self.is_on_ladder = False
-        main_path = ("animations/tile")
-
-        self.idle_texture_pair = load_texture_pair(f"{main_path}_0139.png")
-        self.jump_texture_pair = load_texture_pair(f"{main_path}_jump.png")
-        self.fall_texture_pair = load_texture_pair(f"{main_path}_fall.png")
-
-        # Load character walking textures
-        self.walk_textures = []
-        for i in range(3):
-            texture = load_texture_pair(f"{main_path}_walk{i}.png")
-            self.walk_textures.append(texture)
-
-        # Load character climbing textures
-        self.climbing_textures = []
-        texture = arcade.load_texture(f"{main_path}_climb0.png")
-        self.climbing_textures.append(texture)
-        texture = arcade.load_texture(f"{main_path}_climb1.png")
-        self.climbing_textures.append(texture)
-
-        # Setting the texture when the character is idle
-        self.texture = self.idle_texture_pair[0]
-
-    def update_animation(self, delta_time: float = 1 / 60):
-        """
-        Function used to change textures when the player should be animated
-        """
-        # Changing if the character should face left or right
-        if self.change_x < 0 and self.character_facedirection == RIGHTFACING:
-            self.character_facedirection = LEFTFACING
-        elif self.change_x > 0 and self.character_facedirection == LEFTFACING:
-            self.character_facedirection = RIGHTFACING
-
-        # Player animations when they are climbing the ladder
-        if self.is_on_ladder:
-            self.climbing = True
-        if not self.is_on_ladder and self.climbing:
-            self.climbing = False
-        if self.climbing and abs(self.change_y) > 1:
-            self.cur_texture += 1
-            if self.cur_texture > 7:
-                self.cur_texture = 0
-        if self.climbing:
-            self.texture = self.climbing_textures[self.cur_texture // 4]
-            return
-
-        # Player animation for jumping
-        if self.change_y > 0 and not self.is_on_ladder:
-            self.texture = self.jump_texture_pair[self.character_facedirection]
-            return
-        elif self.change_y < 0 and not self.is_on_ladder:
-            self.texture = self.fall_texture_pair[self.character_facedirection]
-            return
-
-        # When the player is idle
-        if self.change_x == 0:
-            self.texture = self.idle_texture_pair[self.character_facedirection]
-            return
-
-        # Player animation for walking
-        self.cur_texture += 1
-        if self.cur_texture > 2:
-            self.cur_texture = 0
-        self.texture = self.walk_textures[self.cur_texture][
-            self.character_facedirection
-        ]
-
-
 class MainMenu(arcade.View):
     """
     Class used to display main menu 
     """
 
-    def __init__(self):
+    def __init__(self, record_file=None, trace_file=None, audio=True):
         """
         This is run once when we switch to this view
         """
         super().__init__()
 
+        # Where the game should save a recording of the inputs
+        self.record_file = record_file
+
+        # Where the game should save a trace of its phase timings
+        self.trace_file = trace_file
+
+        # Whether the game plays sounds
+        self.audio = audio
+
         # Setting the backgroud for instruction screen
         self.texture = arcade.load_texture("Backgrounds/instructions.png")
 
@@ -169,7 +63,7 @@ class MainMenu(arcade.View):
         """
         Use a mouse press to advance to the 'game' view.
         """
-        game_view = GameView()
+        game_view = GameView(self.record_file, self.trace_file, self.audio)
         self.window.show_view(game_view)
 
     def on_draw(self):
@@ -184,176 +78,92 @@ class MainMenu(arcade.View):
 
 class GameView(arcade.View):
     """
-    Main application class.
+    Main application class. The game rules live in Simulation,
+    this view only feeds it the keyboard and draws it.
     """
 
-    def __init__(self):
+    def __init__(self, record_file=None, trace_file=None, audio=True):
 
         # Initializer for the game
         super().__init__()
 
-        # arcade.set_background_color(arcade.csscolor.DEEP_SKY_BLUE)
+        # Phase timings, only taken while the overlay is shown or
+        # the game is traced to trace_file
+        self.trace_file = trace_file
+        self.profiler = Profiler(tracing=bool(trace_file))
+        self.profiler.enabled = bool(trace_file)
+        self.profile_overlay = None
 
-        # To keep track of time on each level
-        self.total_time = 0.0
-        self.output = "00:00:00"
-        self.time_level1 = 0
-        self.time_level2 = 0
-        self.time_level3 = 0
+        # arcade.set_background_color(arcade.csscolor.DEEP_SKY_BLUE)
 
+        # Every background is decoded once, switching is a texture swap
+        self.backgrounds = BackgroundRegistry()
         self.background = None
 
+        # Tiles and player frames go into the shared atlas up front
+        build_atlas()
+
         # Track the current state of what key is pressed
-        self.left_pressed = False
-        self.right_pressed = False
-        self.up_pressed = False
-        self.down_pressed = False
-        self.jump_needs_reset = False
-
-        # Our Scene Object
-        self.scene = None
-
-        # Our TileMap Object
-        self.tile_map = None
-
-        # Keep track of sprite lists
-        self.coin_list = None
-        self.wall_list = None
-        self.enemies_list = None
-        self.moving_wall_list = None
-
-        # Separate variable that holds the player sprite
-        self.player_sprite = None
-        self.player_list = None
-        # Our 'physics' engine
-        self.physics_engine = None
-        # A Camera that can be used for scrolling the screen
+        self.keys = 0
+
+        # Parsed levels, kept so respawning doesn't reload the map
+        self.level_cache = LevelCache()
+
+        # The game itself
+        self.simulation = None
+
+        # Time not yet used by a fixed simulation step
+        self.time_left_over = 0.0
+
+        # Inputs of every step, saved to record_file if one is given
+        self.record_file = record_file
+        self.recording = None
+
+        # Snapshots of the last few seconds, Backspace goes back to one
+        self.rewind = SnapshotRing()
+
+        # A Camera that can be used for scrolling the screen, and what
+        # moves it after the player
         self.camera = None
+        self.camera_control = None
 
-        # Load sounds
-        self.collect_coin_sound = arcade.load_sound(":resources:sounds/"
-                                                    "coin1.wav")
-        self.jump_sound = arcade.load_sound(":resources:sounds/jump1.wav")
-        self.game_over = arcade.load_sound(":resources:sounds/gameover1.wav")
-        self.teleport_sound = arcade.load_sound(":resources:sounds/"
-                                                "phaseJump1.wav")
+        # Sounds of the simulation events, played from players made here
+        if audio:
+            self.sounds = SoundManager()
+        else:
+            self.sounds = NULL_SOUND_MANAGER
 
         # A Camera that can be used to draw GUI elements
         self.gui_camera = None
 
-        # Keep track of the score, death and level
-        self.score = 0
-        self.death = 0
-        self.level = 1
-
-        # Setting up a different starting height for different levels
-        self.start_y = PLAYER_START_Y
+        # Score, death count and timer text
+        self.hud = None
 
     def setup(self):
         """
         Set up the game here. Call this function to restart the game.
         """
 
-        # Set up the Cameras
-        self.gui_camera = arcade.Camera(self.window.width, self.window.height)
-        self.camera = arcade.Camera(self.window.width, self.window.height)
-
-        # Setting background image
-        self.background = arcade.load_texture("Backgrounds/"
-                                              "backgrounds.png")
-
-        # Finding the map for each level
-        map_path = ("")
-        map_name = (f"{map_path}map1_level_{self.level}.tmx")
-        layer_options = {
-            "Platforms": {
-                "use_spatial_hash": True,
-            },
-        }
-
-        # Layer Specific Options for the Tilemap
-        layer_options = {
-            LAYER_NAME_PLATORMS: {
-                "use_spatial_hash": True,
-            },
-            LAYER_NAME_COINS: {
-                "use_spatial_hash": True,
-            },
-            LAYER_NAME_DONT_TOUCH: {
-                "use_spatial_hash": True,
-            },
-
-            LAYER_NAME_ENEMIES: {
-                "use_spatial_hash": False,
-            },
-
-            LAYER_NAME_MOVING_PLATFORM: {
-                "use_spatial_hash": False,
-            },
-
-            LAYER_NAME_TELEPORTER: {
-                "use_spatial_hash": True,
-            },
-
-            LAYER_NAME_TELEPORTER_BACK: {
-                "use_spatial_hash": True,
-            },
-
-            LAYER_NAME_LADDERS: {
-                "use_spatial_hash": True,
-            },
-        }
-
-        # Load in TileMap
-        self.tile_map = arcade.load_tilemap(map_name,
-                                            TILE_SCALING, layer_options)
-
-        # Initiate New Scene with our TileMap,
-        # this will automatically add all layers
-        # from the map as SpriteLists in the scene in the proper order.
-        self.scene = arcade.Scene.from_tilemap(self.tile_map)
-
-        # Keep track of the score in the level
-        self.score = 0
-
-        # self.scene.add_sprite_list_before("Player",
-        #                                   LAYER_NAME_FOREGROUND)
-        # self.scene = arcade.Scene()
-
-        # Keep track of time of level
-        self.displaytotaltime = 0
-        self.total_time = 0.0
-
-        # If the level is on 3 then the player should start higher up
-        if self.level == 3:
-            self.start_y = PLAYER_START_Y_THREE
-
-        # Set up the player, specifically
-        # placing it at these coordinates.
-        self.player_sprite = PlayerCharacter()
-        self.player_sprite.center_x = PLAYER_START_X
-        self.player_sprite.center_y = self.start_y
-        self.scene.add_sprite(LAYER_NAME_PLAYER, self.player_sprite)
-        self.scene.add_sprite_list("walls", use_spatial_hash=True)
-
-        # image_source = ("C:/Users/nanda/OneDrive - Westlake Boys High School"
-        # "/13 - DTP/assessment/python assessment_final/Tiles/tile_0139.png")
-        # self.player_sprite = arcade.Sprite(image_source, CHARACTER_SCALING)
-        # self.player_sprite.center_x = PLAYER_START_X
-        # self.player_sprite.center_y = PLAYER_START_Y
-        # self.scene.add_sprite("Player", self.player_sprite)
-
-        if self.tile_map.background_color:
-            arcade.set_background_color(self.tile_map.background_color)
-
-        self.physics_engine = arcade.PhysicsEnginePlatformer(
-            self.player_sprite,
-            platforms=self.scene[LAYER_NAME_MOVING_PLATFORM],
-            gravity_constant=GRAVITY,
-            ladders=self.scene[LAYER_NAME_LADDERS],
-            walls=self.scene["Platforms"]
-        )
-        self.physics_engine.platforms.append(self.scene[LAYER_NAME_ENEMIES])
+        # Set up the Cameras once, they don't change between respawns
+        if self.camera is None:
+            self.gui_camera = arcade.Camera(self.window.width,
+                                            self.window.height)
+            self.camera = arcade.Camera(self.window.width, self.window.height)
+            self.camera_control = CameraController(self.camera)
+            self.hud = Hud()
+            self.profile_overlay = ProfileOverlay(
+                self.profiler, 10, self.window.height - 10)
+
+        self.simulation = Simulation(level_cache=self.level_cache,
+                                     profiler=self.profiler)
+        self.time_left_over = 0.0
+        self.recording = Recording(self.simulation.level)
+        self.rewind.clear()
+        self.center_camera_to_player(snap=True)
+
+        if self.simulation.tile_map.background_color:
+            arcade.set_background_color(
+                self.simulation.tile_map.background_color)
 
     def on_show(self):
         self.setup()
@@ -362,301 +172,154 @@ class GameView(arcade.View):
         """
         Render the screen.
         """
+        simulation = self.simulation
+        profiler = self.profiler
 
         # Clear the background screen
         self.clear()
 
-        # If the player is on level 3 and goes to a lower part,
-        # it changes the background to a cave
-        if self.level == 3 and self.player_sprite.center_y < 409:
-            self.background = arcade.load_texture("Backgrounds/cave.png")
+        # The background changes when the player is in a region
+        # that has its own, like the cave on level 3
+        with profiler.phase("background"):
+            self.background = self.backgrounds.get(simulation.background)
 
-        arcade.draw_lrwh_rectangle_textured(0, 0, SCREEN_WIDTH,
-                                            SCREEN_HEIGHT, self.background)
+            arcade.draw_lrwh_rectangle_textured(0, 0, SCREEN_WIDTH,
+                                                SCREEN_HEIGHT,
+                                                self.background)
 
         # Activate the game camera
-        self.camera.use()
+        self.camera_control.use()
 
-        # Draw the Scene
-        self.scene.draw()
+        # Draw the Scene, the movers on screen are only given their
+        # positions now
+        with profiler.phase("scene_draw"):
+            left, bottom = self.camera.position
+            simulation.current_level.sync_movers(
+                left, bottom, left + self.camera.viewport_width,
+                bottom + self.camera.viewport_height)
+            simulation.scene.draw()
 
         # Activate the GUI camera before drawing GUI elements
         self.gui_camera.use()
 
         # Drawing the score, death count and timer as well as the
-        # shadow on each and being able to follow the character
-        score_text = f"Score: {self.score}"
-        time_text = f"Time: {self.output}"
-        death_text = f"Deaths: {self.death}"
-        arcade.draw_text(
-            score_text,
-            10,
-            10,
-            arcade.csscolor.BLACK,
-            18,
-            font_name="Kenney Pixel Square"
-        )
+        # shadow on each, the text only changes when the values do
+        with profiler.phase("hud"):
+            self.hud.update(simulation)
+            self.hud.draw()
 
-        arcade.draw_text(
-            score_text,
-            13,
-            13,
-            arcade.csscolor.WHITE,
-            18,
-            font_name="Kenney Pixel Square"
-        )
-
-        arcade.draw_text(
-            death_text,
-            10,
-            40,
-            arcade.csscolor.BLACK,
-            18,
-            font_name="Kenney Pixel Square"
-        )
-
-        arcade.draw_text(
-            death_text,
-            13,
-            43,
-            arcade.csscolor.WHITE,
-            18,
-            font_name="Kenney Pixel Square"
-        )
-
-        arcade.draw_text(
-            time_text,
-            10,
-            70,
-            arcade.csscolor.BLACK,
-            18,
-            font_name="Kenney Pixel Square"
-        )
-
-        arcade.draw_text(
-            time_text,
-            13,
-            73,
-            arcade.csscolor.WHITE,
-            18,
-            font_name="Kenney Pixel Square"
-        )
-
-    def process_keychange(self):
-        """
-        Called when we change a key up/down or we move on/off a ladder.
-        """
-        # Process up/down
-        if self.up_pressed and not self.down_pressed:
-            if self.physics_engine.is_on_ladder():
-                self.player_sprite.change_y = PLAYER_MOVEMENT_SPEED
-            elif (
-                self.physics_engine.can_jump(y_distance=10) and not
-                self.jump_needs_reset
-            ):
-                self.player_sprite.change_y = PLAYER_JUMP_SPEED
-                self.jump_needs_reset = True
-                arcade.play_sound(self.jump_sound)
-        elif self.down_pressed and not self.up_pressed:
-            if self.physics_engine.is_on_ladder():
-                self.player_sprite.change_y = -PLAYER_MOVEMENT_SPEED
-
-        # Process up/down when on a ladder and no movement
-        if self.physics_engine.is_on_ladder():
-            if not self.up_pressed and not self.down_pressed:
-                self.player_sprite.change_y = 0
-            elif self.up_pressed and self.down_pressed:
-                self.player_sprite.change_y = 0
-
-        # Process left/right
-        if self.right_pressed and not self.left_pressed:
-            self.player_sprite.change_x = PLAYER_MOVEMENT_SPEED
-        elif self.left_pressed and not self.right_pressed:
-            self.player_sprite.change_x = -PLAYER_MOVEMENT_SPEED
-        else:
-            self.player_sprite.change_x = 0
+        self.profile_overlay.update()
+        self.profile_overlay.draw()
 
     def on_key_press(self, key, modifiers):
         """
         Called whenever a key is pressed.
         """
         if key == arcade.key.UP or key == arcade.key.W:
-            self.up_pressed = True
+            self.keys |= INPUT_UP
         elif key == arcade.key.DOWN or key == arcade.key.S:
-            self.down_pressed = True
+            self.keys |= INPUT_DOWN
         elif key == arcade.key.LEFT or key == arcade.key.A:
-            self.left_pressed = True
+            self.keys |= INPUT_LEFT
         elif key == arcade.key.RIGHT or key == arcade.key.D:
-            self.right_pressed = True
-
-        self.process_keychange()
-        # if key == arcade.key.UP or key == arcade.key.W:
-        #     if self.physics_engine.can_jump():
-        #         self.player_sprite.change_y = PLAYER_JUMP_SPEED
-        #         arcade.play_sound(self.jump_sound)
-        # elif key == arcade.key.LEFT or key == arcade.key.A:
-        #     self.player_sprite.change_x = -PLAYER_MOVEMENT_SPEED
-        # elif key == arcade.key.RIGHT or key == arcade.key.D:
-        #     self.player_sprite.change_x = PLAYER_MOVEMENT_SPEED
+            self.keys |= INPUT_RIGHT
+        elif key == arcade.key.BACKSPACE:
+            self.rewind_simulation()
+        elif key == arcade.key.F3:
+            # Show or hide the phase timings, they are only taken
+            # while shown unless the game is being traced
+            self.profile_overlay.toggle()
+            self.profiler.enabled = (self.profile_overlay.visible or
+                                     bool(self.trace_file))
 
     def on_key_release(self, key, modifiers):
         """Called when the user releases a key."""
         if key == arcade.key.UP or key == arcade.key.W:
-            self.up_pressed = False
-            self.jump_needs_reset = False
+            self.keys &= ~INPUT_UP
         elif key == arcade.key.DOWN or key == arcade.key.S:
-            self.down_pressed = False
+            self.keys &= ~INPUT_DOWN
         elif key == arcade.key.LEFT or key == arcade.key.A:
-            self.left_pressed = False
+            self.keys &= ~INPUT_LEFT
         elif key == arcade.key.RIGHT or key == arcade.key.D:
-            self.right_pressed = False
-
-        self.process_keychange()
-        # if key == arcade.key.UP or key == arcade.key.W:
-        #     self.up_pressed = False
-        #     self.jump_needs_reset = False
-        # elif key == arcade.key.LEFT or key == arcade.key.A:
-        #     self.player_sprite.change_x = 0
-        # elif key == arcade.key.RIGHT or key == arcade.key.D:
-        #     self.player_sprite.change_x = 0
-
-    def center_camera_to_player(self):
-        screen_center_x = (self.player_sprite.center_x -
-                           (self.camera.viewport_width / 2))
-        screen_center_y = (self.player_sprite.center_y -
-                           (self.camera.viewport_height / 2))
-
-        if screen_center_x < 0:
-            screen_center_x = 0
-        if screen_center_y < 0:
-            screen_center_y = 0
-        player_centered = (screen_center_x, screen_center_y)
-        self.camera.move_to(player_centered)
+            self.keys &= ~INPUT_RIGHT
 
-    def on_update(self, delta_time):
+    def rewind_simulation(self):
         """
-        Movement and game logic
+        Go back to the snapshot before the last one, between one and two
+        snapshot intervals ago. The recording is cut back to match.
         """
+        if not self.rewind:
+            return
+        snapshot = self.rewind.rewind(self.simulation,
+                                      min(1, len(self.rewind) - 1))
+        del self.recording.ticks[snapshot.tick:]
+        self.time_left_over = 0.0
+        self.center_camera_to_player(snap=True)
 
-        # Move the player with the physics engine
-        self.physics_engine.update()
+    def center_camera_to_player(self, delta_time=0.0, snap=False):
+        """
+        Move the camera after the player, or straight onto them with
+        snap
+        """
+        simulation = self.simulation
+        x, y = simulation.player_sprite.position
+        if snap:
+            self.camera_control.set_map(simulation.tile_map)
+            self.camera_control.snap_to(x, y)
+        else:
+            self.camera_control.follow(simulation.tile_map, x, y,
+                                       delta_time)
 
+    def on_update(self, delta_time):
+        """
+        Run as many fixed simulation steps as the frame time covers
+        """
         # Update global variables
         global total_time_display
         global total_death_display
 
-        # Update animations
-        if self.physics_engine.can_jump():
-            self.player_sprite.can_jump = False
-        else:
-            self.player_sprite.can_jump = True
+        # Each sound plays at most once a frame
+        self.sounds.new_frame()
 
-        if (self.physics_engine.is_on_ladder() and not
-           self.physics_engine.can_jump()):
-            self.player_sprite.is_on_ladder = True
-            self.process_keychange()
-        else:
-            self.player_sprite.is_on_ladder = False
-            self.process_keychange()
+        # Don't try to catch up on long stalls, just drop the time
+        self.time_left_over = min(self.time_left_over + delta_time,
+                                  FIXED_DT * MAX_STEPS_PER_FRAME)
 
-        # Update Animations
-        self.scene.update_animation(
-            delta_time, [LAYER_NAME_COINS, LAYER_NAME_BACKGROUND,
-                         LAYER_NAME_PLAYER]
-        )
+        while self.time_left_over >= FIXED_DT:
+            self.time_left_over -= FIXED_DT
+            with self.profiler.phase("step"):
+                events = self.simulation.step(self.keys)
+            self.recording.record(self.keys, self.simulation)
+            if self.simulation.tick % REWIND_INTERVAL == 0:
+                self.rewind.capture(self.simulation)
 
-        # Checking if player hits coins so it can collect it
-        coin_hit_list = arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene["Coins"]
-        )
-        for coin in coin_hit_list:
-            coin.remove_from_sprite_lists()
-            arcade.play_sound(self.collect_coin_sound)
-            self.score += 1
-
-        # Position the camera
-        self.center_camera_to_player()
-        self.scene.update([LAYER_NAME_MOVING_PLATFORM, LAYER_NAME_ENEMIES])
-
-        # Checking if player hits an enemy or "don't touch" to
-        # reset the level
-        dont_touch_hit_list = arcade.check_for_collision_with_lists(
-            self.player_sprite, [self.scene["Don't Touch"],
-                                 self.scene["Enemies"], ],
-        )
-        for hit in dont_touch_hit_list:
-            arcade.play_sound(self.game_over)
-            self.death += 1
-            total_death_display = self.death
-            # game_over = GameOverView()
-            # self.window.show_view(game_over)
-            self.setup()
-            return
+            with self.profiler.phase("sounds"):
+                for event in events:
+                    self.sounds.play(event)
 
-        # Checking if player touches a teleporter
-        # to be teleported to the other door
-        teleport_touch_list = arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene["Teleport"]
-        )
-        for tp in teleport_touch_list:
-            arcade.play_sound(self.teleport_sound)
-            self.player_sprite.center_x = PLAYER_TP_X
-            self.player_sprite.center_y = PLAYER_TP_Y
+            total_death_display = self.simulation.death
 
-        teleport_back_touch_list = arcade.check_for_collision_with_list(
-            self.player_sprite, self.scene["Teleport Back"]
-        )
-        for tp in teleport_back_touch_list:
-            arcade.play_sound(self.teleport_sound)
-            self.player_sprite.center_x = PLAYER_TP_X_BACK
-            self.player_sprite.center_y = PLAYER_TP_Y_BACK
-
-        # if self.level == 3 and self.score == COINS_COLLECTED:
-        #     self.displaytotaltime= (self.time_level1 +
-        #                             self.time_level2 +
-        #                             self.time_level3)
-        #
-        #     tot = self.displaytotaltime
-        #     game_complete = GameCompleteView()
-        #    self.window.show_view(game_complete)
-        #     return
-
-        # Checking if the player collects all the coins
-        # to go to the next level
-        if self.score == COINS_COLLECTED:
-            # Saving the time the player collects all the coins
-            # so they can be added as a total time when the
-            # player finishes the game
-            if self.level == 1:
-                self.time_level1 = self.total_time
-            elif self.level == 2:
-                self.time_level2 = self.total_time
-            elif self.level == 3:
-                self.time_level3 = self.total_time
-                self.displaytotaltime = (self.time_level1 +
-                                         self.time_level2 + self.time_level3)
-                total_time_display = self.displaytotaltime
+            if self.simulation.game_complete:
+                total_time_display = self.simulation.displaytotaltime
+                self.save_recording()
                 game_complete = GameCompleteView()
                 self.window.show_view(game_complete)
                 return
-            self.level += 1
-            self.setup()
-            return
-
-        #  Calculating time
-        self.total_time += delta_time
-
-        # Calculate minutes
-        minutes = int(self.total_time) // 60
-
-        # Calculate seconds by using a modulus (remainder)
-        seconds = int(self.total_time) % 60
 
-        # Calculate 100s of a second
-        seconds_100s = int((self.total_time - seconds) * 100)
+        # Position the camera
+        with self.profiler.phase("camera"):
+            self.center_camera_to_player(delta_time)
 
-        # Figure out our output
-        self.output = f"{minutes:02d}:{seconds:02d}:{seconds_100s:02d}"
+    def save_recording(self):
+        """
+        Write the inputs played so far to the record file, if there is
+        one, and the phase timings to the trace file
+        """
+        if self.record_file and self.recording:
+            self.recording.finish(self.simulation)
+            self.recording.save(self.record_file)
+        if self.trace_file:
+            self.profiler.write_trace(self.trace_file)
 
 '''class GameOverView(arcade.View):
     """
@@ -740,11 +403,26 @@ def main():
     """
     Main function
     """
+    parser = argparse.ArgumentParser(description=SCREEN_TITLE)
+    parser.add_argument("--record", metavar="FILE",
+                        help="save the inputs of the game so it can be "
+                             "replayed with replay.py")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="save the time taken by each phase of every "
+                             "frame as a Chrome trace")
+    parser.add_argument("--no-audio", dest="audio", action="store_false",
+                        help="play without sound")
+    args = parser.parse_args()
+
     window = arcade.Window(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
-    menu_view = MainMenu()
+    menu_view = MainMenu(args.record, args.trace, args.audio)
     window.show_view(menu_view)
     arcade.run()
 
+    # Keep the inputs of a game that was closed before the end
+    if isinstance(window.current_view, GameView):
+        window.current_view.save_recording()
+
 
 if __name__ == "__main__":
     main()
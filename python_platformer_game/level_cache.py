@@ -0,0 +1,671 @@
+"""
+Cache of parsed levels so a respawn doesn't reload the TMX file
+"""
+import os
+import tempfile
+import warnings
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from pathlib import Path
+
+import arcade
+import pytiled_parser
+
+from constants import (TILE_SCALING, COINS_NEEDED, LAYER_NAME_PLATORMS,
+                       LAYER_NAME_COINS, LAYER_NAME_DONT_TOUCH,
+                       LAYER_NAME_ENEMIES, LAYER_NAME_MOVING_PLATFORM,
+                       LAYER_NAME_TELEPORTER, LAYER_NAME_TELEPORTER_BACK,
+                       LAYER_NAME_LADDERS,
+                       LAYER_NAME_PLAYER)
+from triggers import (load_triggers, triggers_from_objects,
+                      LAYER_NAME_TRIGGERS)
+from collisions import CollisionBroker
+from chunks import (ChunkedMap, level_chunk_name, write_chunked_level,
+                    TILE_ID_MASK)
+from textures import texture_registry, RegistrySprite
+from movers import make_movers
+from collectibles import CoinStore
+
+# Layer Specific Options for the Tilemap
+LAYER_OPTIONS = {
+    LAYER_NAME_PLATORMS: {
+        "use_spatial_hash": True,
+    },
+    # Coins are found through the level's coin store
+    LAYER_NAME_COINS: {
+        "use_spatial_hash": False,
+    },
+    LAYER_NAME_DONT_TOUCH: {
+        "use_spatial_hash": True,
+    },
+
+    # Moving layers are only drawn from, collisions use the hashed
+    # list of the movers near the player
+    LAYER_NAME_ENEMIES: {
+        "use_spatial_hash": False,
+    },
+
+    LAYER_NAME_MOVING_PLATFORM: {
+        "use_spatial_hash": False,
+    },
+
+    LAYER_NAME_TELEPORTER: {
+        "use_spatial_hash": True,
+    },
+
+    LAYER_NAME_TELEPORTER_BACK: {
+        "use_spatial_hash": True,
+    },
+
+    LAYER_NAME_LADDERS: {
+        "use_spatial_hash": True,
+    },
+}
+
+# Layers whose sprites move while the level is played
+MOVING_LAYERS = (LAYER_NAME_ENEMIES, LAYER_NAME_MOVING_PLATFORM)
+
+# The three shipped levels fit in the cache at once. Measured with the
+# level KB column of benchmark.py, the compiled levels hold 3.3, 1.4 and
+# 5.3 MB, about 10 MB together (13.5 MB loaded from the TMX files). The
+# tile images are shared by every level and come on top of that.
+MAX_CACHED_LEVELS = 3
+
+# Chunks around the player that must be built before the next step
+LOADED_CHUNK_RADIUS = 1
+
+# Chunks further out that are built on a background thread
+PREFETCH_CHUNK_RADIUS = 2
+
+# Most chunks a streamed level keeps, the least recently used go first.
+# This must be more than the (2 * PREFETCH_CHUNK_RADIUS + 1) ** 2 chunks
+# around the player.
+MAX_LOADED_CHUNKS = 64
+
+
+def layer_gids(layer):
+    '''
+    Function to give the tile ids used by a tile or object layer, without
+    their flip flags
+    '''
+    if isinstance(layer, pytiled_parser.ObjectLayer):
+        rows = [[getattr(tiled_object, "gid", 0)
+                 for tiled_object in layer.tiled_objects]]
+    elif layer.chunks:
+        rows = [row for chunk in layer.chunks for row in chunk.data]
+    else:
+        rows = layer.data or []
+    return {gid & TILE_ID_MASK for row in rows for gid in row if gid}
+
+
+def tile_map_options(tiled_map):
+    '''
+    Function to give every tile and object layer of a parsed map its
+    options, with its sprites made as RegistrySprites so they share the
+    registry's textures. arcade makes animated tiles as
+    AnimatedTimeBasedSprites and refuses any other class for them, so a
+    layer with an animated tile keeps arcade's own classes.
+    '''
+    animated = {first_gid + tile_id
+                for first_gid, tileset in tiled_map.tilesets.items()
+                for tile_id, tile in (tileset.tiles or {}).items()
+                if tile.animation}
+    options = {}
+    layers = list(tiled_map.layers)
+    while layers:
+        layer = layers.pop()
+        if isinstance(layer, pytiled_parser.LayerGroup):
+            layers.extend(layer.layers)
+        elif isinstance(layer, (pytiled_parser.TileLayer,
+                                pytiled_parser.ObjectLayer)):
+            options[layer.name] = dict(LAYER_OPTIONS.get(layer.name, {}))
+            if not animated & layer_gids(layer):
+                options[layer.name]["custom_class"] = RegistrySprite
+    return options
+
+
+def level_map_name(level):
+    '''
+    Function to find the map file for a level
+    '''
+    return f"map1_level_{level}.tmx"
+
+
+class Level:
+    '''
+    Class holding a parsed level and the state needed to reset it.
+    Subclasses that read maps another way override _load_map() and
+    _make_coins().
+    '''
+    def __init__(self, level, map_file=None, tiled_map=None):
+
+        self.level = level
+
+        # The tile map, scene, triggers and spawn point
+        self._load_map(map_file, tiled_map)
+
+        # Enemies and moving platforms, stepped all at once
+        self.movers = {name: make_movers(self.get_layer(name))
+                       for name in MOVING_LAYERS}
+
+        # Layers the player can touch during play
+        self.collisions = CollisionBroker()
+        self.collisions.add_layer(LAYER_NAME_DONT_TOUCH,
+                                  self.get_layer(LAYER_NAME_DONT_TOUCH))
+        self.collisions.add_layer(LAYER_NAME_ENEMIES,
+                                  self.movers[LAYER_NAME_ENEMIES].near,
+                                  dynamic=True)
+
+        # Every coin stays in its sprite list, collected ones are hidden
+        self.coins = self._make_coins()
+        self.coins_needed = COINS_NEEDED.get(level, self.coins.count)
+
+    def _load_map(self, map_file, tiled_map):
+        """
+        Load the TileMap, the map may already have been parsed by the
+        preload thread
+        """
+        map_file = map_file or level_map_name(self.level)
+        if tiled_map is None:
+            tiled_map = pytiled_parser.parse_map(Path(map_file))
+        self.tile_map = arcade.TileMap(
+            map_file, TILE_SCALING, tile_map_options(tiled_map),
+            tiled_map=tiled_map)
+
+        # Initiate New Scene with our TileMap,
+        # this will automatically add all layers
+        # from the map as SpriteLists in the scene in the proper order.
+        self.scene = arcade.Scene.from_tilemap(self.tile_map)
+        self.scene.add_sprite_list(LAYER_NAME_PLAYER)
+        self.scene.add_sprite_list("walls", use_spatial_hash=True)
+
+        # Teleporters, background regions and the spawn point
+        self.triggers, self.spawn_point = load_triggers(self.tile_map)
+
+    def _make_coins(self):
+        """
+        Return the coin store of the level, with every coin sprite in it
+        """
+        coin_list = self.get_layer(LAYER_NAME_COINS)
+        coins = CoinStore(
+            [coin.position for coin in coin_list],
+            max((max(coin.width, coin.height) / 2 for coin in coin_list),
+                default=0))
+        for index, coin in enumerate(coin_list):
+            coin.properties["coin_index"] = index
+            coins.add_sprite(coin)
+        return coins
+
+    def get_layer(self, name):
+        """
+        Return the sprite list for a layer, or an empty one if the map
+        doesn't have that layer
+        """
+        if name in self.scene.name_mapping:
+            return self.scene[name]
+        return arcade.SpriteList(lazy=True)
+
+    def upload(self):
+        """
+        Make the OpenGL buffers of every sprite list now instead of on
+        the first draw. This must run on the main thread, and does
+        nothing without a window.
+        """
+        try:
+            arcade.get_window()
+        except RuntimeError:
+            return
+        for sprite_list in self.scene.sprite_lists:
+            sprite_list.initialize()
+
+    def stream_around(self, x, y):
+        """
+        Make sure the map is loaded around a point. The whole of this
+        kind of level is always loaded.
+        """
+
+    def close(self):
+        """
+        Let go of what the level holds open, called when the level
+        cache forgets it. A TMX level holds nothing open.
+        """
+
+    def reset(self):
+        """
+        Put the mutable layers back to how they were when the level loaded
+        """
+        self.coins.reset()
+        self.reset_movers()
+
+    def reset_movers(self):
+        """
+        Put enemies and moving platforms back where they started
+        """
+        for movers in self.movers.values():
+            movers.reset()
+
+    def near_movers(self, name):
+        """
+        Return the sprite list of the movers of a layer near the player
+        """
+        return self.movers[name].near
+
+    def prepare_movers(self, x, y):
+        """
+        Pick the movers near the player before the physics engine runs
+        """
+        for movers in self.movers.values():
+            movers.prepare(x, y)
+
+    def update_movers(self):
+        """
+        Step every enemy and moving platform
+        """
+        for movers in self.movers.values():
+            movers.update()
+
+    def sync_movers(self, left, bottom, right, top):
+        """
+        Give the movers on screen their positions before drawing
+        """
+        for movers in self.movers.values():
+            movers.sync(left, bottom, right, top)
+
+
+class StreamedLevel(Level):
+    '''
+    Class for a level read from a chunked file. Only the chunks of tiles
+    near the player are turned into sprites, so memory and per frame
+    work don't grow with the size of the map. A map small enough to be
+    kept whole is built as soon as it is opened.
+
+    The sprite lists are lazy, so a level can be built on the preload
+    thread and have its OpenGL buffers made later by upload().
+    '''
+    def __init__(self, level, chunked_map=None):
+
+        if chunked_map is None:
+            chunked_map = ChunkedMap(level_chunk_name(level))
+        self.tile_map = chunked_map
+
+        # Size of a tile in game pixels
+        self.tile_size = (chunked_map.tile_width * TILE_SCALING,
+                          chunked_map.tile_height * TILE_SCALING)
+
+        # (chunk x, chunk y) -> {layer name: sprites}, oldest first
+        self.loaded = OrderedDict()
+
+        # Chunks being built on the background thread
+        self.pending = {}
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        # Chunk the player was in on the last call to stream_around
+        self.current_chunk = None
+
+        super().__init__(level)
+
+        if chunked_map.columns * chunked_map.rows <= MAX_LOADED_CHUNKS:
+            for chunk in self._chunks_around((0, 0), max(
+                    chunked_map.columns, chunked_map.rows)):
+                self._add_chunk(chunk, self._build_chunk(*chunk))
+        else:
+            self.stream_around(*self.spawn_point)
+
+    def _load_map(self, map_file, tiled_map):
+        """
+        Make the scene from the chunked map. Sprite lists are empty
+        until chunks are loaded into them, object layers are small so
+        they are built straight away.
+        """
+        chunked_map = self.tile_map
+        self.scene = arcade.Scene()
+        trigger_objects = []
+        for layer in chunked_map.layers:
+            name = layer["name"]
+            if name == LAYER_NAME_TRIGGERS:
+                trigger_objects = layer["objects"]
+                continue
+            options = LAYER_OPTIONS.get(name, {})
+            self._add_layer(name, options.get("use_spatial_hash", False))
+            if layer["kind"] == "objects":
+                for tiled_object in layer["objects"]:
+                    if tiled_object["gid"]:
+                        self.scene.add_sprite(
+                            name, self._object_sprite(tiled_object))
+        self._add_layer(LAYER_NAME_PLAYER)
+        self._add_layer("walls", use_spatial_hash=True)
+
+        # Teleporters, background regions and the spawn point
+        self.triggers, self.spawn_point = triggers_from_objects(
+            trigger_objects, chunked_map.height * chunked_map.tile_height)
+
+    def _make_coins(self):
+        """
+        Return the coin store of the level, which knows every coin of
+        the map whether its chunk is loaded or not
+        """
+        chunked_map = self.tile_map
+
+        # Index of every coin in the coin store, by its (column, row)
+        self.coin_indices = {}
+        positions = []
+        if LAYER_NAME_COINS in chunked_map.tile_layer_names:
+            layer_index = chunked_map.tile_layer_names.index(
+                LAYER_NAME_COINS)
+            size = chunked_map.chunk_size
+            for chunk_y in range(chunked_map.rows):
+                for chunk_x in range(chunked_map.columns):
+                    tiles = chunked_map.chunk_tiles(layer_index, chunk_x,
+                                                    chunk_y)
+                    for index, gid in enumerate(tiles or ()):
+                        if gid & TILE_ID_MASK:
+                            column = chunk_x * size + index % size
+                            row = chunk_y * size + index // size
+                            self.coin_indices[(column, row)] = len(positions)
+                            positions.append(self._tile_center(column, row))
+        return CoinStore(positions, max(self.tile_size) / 2)
+
+    def _add_layer(self, name, use_spatial_hash=False):
+        """
+        Add an empty lazy sprite list to the scene
+        """
+        sprite_list = arcade.SpriteList(use_spatial_hash=use_spatial_hash,
+                                        lazy=True)
+        # Scene.add_sprite_list() would swap an empty list for a new one
+        self.scene.name_mapping[name] = sprite_list
+        self.scene.sprite_lists.append(sprite_list)
+
+    def _object_sprite(self, tiled_object):
+        """
+        Make the sprite for a tile placed on an object layer
+        """
+        map_height = self.tile_map.height * self.tile_map.tile_height
+        texture = texture_registry.get(
+            self.tile_map.tiles[tiled_object["gid"] & TILE_ID_MASK])
+        sprite = arcade.Sprite(scale=TILE_SCALING, texture=texture)
+        sprite.width = width = tiled_object["width"] * TILE_SCALING
+        sprite.height = height = tiled_object["height"] * TILE_SCALING
+
+        # Tiled places tile objects by their bottom left corner and turns
+        # them clockwise about it, arcade turns sprites anticlockwise
+        # about their centre
+        left = tiled_object["x"] * TILE_SCALING
+        bottom = (map_height - tiled_object["y"]) * TILE_SCALING
+        sprite.angle = -(tiled_object["rotation"] or 0)
+        center_x, center_y = arcade.rotate_point(width / 2, height / 2,
+                                                 0, 0, sprite.angle)
+        sprite.position = (left + center_x, bottom + center_y)
+
+        properties = tiled_object["properties"]
+        sprite.properties.update(properties)
+        for name in ("change_x", "change_y"):
+            if name in properties:
+                setattr(sprite, name, float(properties[name]))
+        for name in ("boundary_left", "boundary_right", "boundary_top",
+                     "boundary_bottom"):
+            if name in properties:
+                setattr(sprite, name, float(properties[name]))
+        return sprite
+
+    def _tile_center(self, column, row):
+        """
+        Return the centre of a tile in game pixels, rows counted down
+        from the top as in Tiled
+        """
+        tile_width, tile_height = self.tile_size
+        return ((column + 0.5) * tile_width,
+                (self.tile_map.height - row - 0.5) * tile_height)
+
+    def _build_chunk(self, chunk_x, chunk_y):
+        """
+        Make the sprites of one chunk. This runs on the background thread
+        so it must not touch the sprite lists.
+        """
+        chunked_map = self.tile_map
+        size = chunked_map.chunk_size
+        sprites = {}
+
+        for layer_index, name in enumerate(chunked_map.tile_layer_names):
+            tiles = chunked_map.chunk_tiles(layer_index, chunk_x, chunk_y)
+            if tiles is None:
+                continue
+            layer_sprites = sprites.setdefault(name, [])
+            for index, gid in enumerate(tiles):
+                gid &= TILE_ID_MASK
+                if not gid:
+                    continue
+                column = chunk_x * size + index % size
+                row = chunk_y * size + index // size
+                sprite = arcade.Sprite(
+                    scale=TILE_SCALING,
+                    texture=texture_registry.get(chunked_map.tiles[gid]))
+                sprite.position = self._tile_center(column, row)
+                sprite.properties["tile"] = (column, row)
+                if name == LAYER_NAME_COINS:
+                    sprite.properties["coin_index"] = \
+                        self.coin_indices[(column, row)]
+                layer_sprites.append(sprite)
+        return sprites
+
+    def _add_chunk(self, chunk, sprites):
+        """
+        Put the sprites of a built chunk into the scene
+        """
+        self.loaded[chunk] = sprites
+        for name, layer_sprites in sprites.items():
+            sprite_list = self.scene[name]
+            for sprite in layer_sprites:
+                sprite_list.append(sprite)
+                if name == LAYER_NAME_COINS:
+                    self.coins.add_sprite(sprite)
+                elif name == LAYER_NAME_DONT_TOUCH:
+                    self.collisions.add_sprite(name, sprite)
+
+    def _remove_chunk(self, chunk):
+        """
+        Take the sprites of a chunk out of the scene
+        """
+        sprites = self.loaded.pop(chunk)
+        for name, layer_sprites in sprites.items():
+            for sprite in layer_sprites:
+                if name == LAYER_NAME_COINS:
+                    self.coins.remove_sprite(sprite)
+                elif name == LAYER_NAME_DONT_TOUCH:
+                    self.collisions.remove_sprite(name, sprite)
+                sprite.remove_from_sprite_lists()
+
+    def _chunks_around(self, chunk, radius):
+        chunk_x, chunk_y = chunk
+        for y in range(max(chunk_y - radius, 0),
+                       min(chunk_y + radius + 1, self.tile_map.rows)):
+            for x in range(max(chunk_x - radius, 0),
+                           min(chunk_x + radius + 1, self.tile_map.columns)):
+                yield x, y
+
+    def chunk_at(self, x, y):
+        """
+        Return the chunk holding a point in game pixels
+        """
+        tile_width, tile_height = self.tile_size
+        column = int(x // tile_width)
+        row = self.tile_map.height - 1 - int(y // tile_height)
+        size = self.tile_map.chunk_size
+        return column // size, row // size
+
+    def stream_around(self, x, y):
+        """
+        Make sure the chunks around a point are loaded and start building
+        the ones a bit further out
+        """
+        # Add the chunks the background thread has finished
+        for chunk, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[chunk]
+                if chunk not in self.loaded:
+                    self._add_chunk(chunk, future.result())
+
+        chunk = self.chunk_at(x, y)
+        if chunk == self.current_chunk:
+            return
+        self.current_chunk = chunk
+
+        # The chunks the player can touch are needed right now
+        for near in self._chunks_around(chunk, LOADED_CHUNK_RADIUS):
+            if near in self.loaded:
+                self.loaded.move_to_end(near)
+                continue
+            future = self.pending.pop(near, None)
+            if future:
+                self._add_chunk(near, future.result())
+            else:
+                self._add_chunk(near, self._build_chunk(*near))
+
+        for near in self._chunks_around(chunk, PREFETCH_CHUNK_RADIUS):
+            if near in self.loaded:
+                self.loaded.move_to_end(near)
+            elif near not in self.pending:
+                self.pending[near] = self.executor.submit(self._build_chunk,
+                                                          *near)
+
+        # Forget the chunks the player has been away from the longest
+        while len(self.loaded) > MAX_LOADED_CHUNKS:
+            self._remove_chunk(next(iter(self.loaded)))
+
+    def close(self):
+        """
+        Stop the background thread and unmap the level file. Chunks that
+        aren't loaded can't be built after this.
+        """
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+        # A chunk already being built still reads the file
+        wait(self.pending.values())
+        self.pending.clear()
+        self.tile_map.close()
+
+
+def compiled_map(level):
+    '''
+    Function to open the compiled file of a level, or return None if
+    there isn't one, it can't be read or the map changed after it was
+    compiled. The TMX file is loaded instead then.
+    '''
+    filename = level_chunk_name(level)
+    if not os.path.exists(filename):
+        return None
+    try:
+        chunked_map = ChunkedMap(filename)
+    except (ValueError, OSError) as error:
+        # Written by another version of the format, or not one at all
+        warnings.warn(f"Can't read {filename} ({error}), loading "
+                      f"{level_map_name(level)} instead")
+        return None
+    if chunked_map.is_stale():
+        chunked_map.close()
+        warnings.warn(f"{filename} is out of date, loading "
+                      f"{level_map_name(level)} instead")
+        return None
+    return chunked_map
+
+
+def compile_level(level):
+    '''
+    Function to compile the TMX map of a level next to it and open the
+    compiled file, or return None if it can't be written. The file is
+    written under a name of its own first, so a game and a batch run
+    compiling the same level at once can't mix their writes.
+    '''
+    filename = level_chunk_name(level)
+    partial = None
+    try:
+        handle, partial = tempfile.mkstemp(
+            suffix=".part", dir=os.path.dirname(filename) or ".")
+        os.close(handle)
+        write_chunked_level(level_map_name(level), partial)
+        os.chmod(partial, 0o644)
+        os.replace(partial, filename)
+        return ChunkedMap(filename)
+    except (ValueError, OSError) as error:
+        warnings.warn(f"Can't compile {level_map_name(level)} ({error})")
+        if partial and os.path.exists(partial):
+            os.remove(partial)
+        return None
+
+
+def prepare_level(level, compile_map=False):
+    '''
+    Function doing the part of loading a level that doesn't need OpenGL,
+    so it can run on the preload thread. A compiled level is built
+    whole with lazy sprite lists, otherwise only the TMX file is parsed
+    since arcade's TileMap makes its sprite lists on the main thread.
+    With compile_map a map with no up to date compiled file is compiled
+    first, so all of the level is built here.
+    '''
+    chunked_map = compiled_map(level)
+    if chunked_map is None and compile_map:
+        chunked_map = compile_level(level)
+    if chunked_map:
+        return StreamedLevel(level, chunked_map)
+    return pytiled_parser.parse_map(Path(level_map_name(level)))
+
+
+class LevelCache:
+    '''
+    Class that parses each level once and keeps it for later respawns.
+    The next level can be loaded on a background thread with preload().
+    '''
+    def __init__(self, max_levels=MAX_CACHED_LEVELS):
+        self.max_levels = max_levels
+        self.levels = OrderedDict()
+
+        # Levels being loaded on the preload thread, made when needed
+        self.preloading = {}
+        self.executor = None
+
+    def get(self, level):
+        """
+        Return the parsed level, loading it if it isn't cached yet.
+        The level is reset so it is ready to be played.
+        """
+        if level in self.levels:
+            self.levels.move_to_end(level)
+            cached = self.levels[level]
+            cached.reset()
+            return cached
+
+        # A preloaded level only needs its sprite lists uploaded, wait
+        # for the preload thread if it hasn't finished yet
+        future = self.preloading.pop(level, None)
+        prepared = future.result() if future else prepare_level(level)
+        if isinstance(prepared, Level):
+            cached = prepared
+        else:
+            cached = Level(level, tiled_map=prepared)
+        cached.upload()
+        self.add(level, cached)
+        return cached
+
+    def preload(self, level):
+        """
+        Start loading a level on the background thread, unless it is
+        already cached or loading. A TMX map is compiled there if it
+        has to be, so get() has no TileMap to build on the main thread.
+        """
+        if level in self.levels or level in self.preloading:
+            return
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        self.preloading[level] = self.executor.submit(prepare_level, level,
+                                                      True)
+
+    def add(self, level, loaded):
+        """
+        Keep a loaded level, used for levels made from other map files
+        """
+        self.levels[level] = loaded
+        self.levels.move_to_end(level)
+
+        # Forget the least recently played level when over the limit
+        while len(self.levels) > self.max_levels:
+            _, forgotten = self.levels.popitem(last=False)
+            forgotten.close()
@@ -0,0 +1,170 @@
+"""
+Player character sprite and its animations
+"""
+import arcade
+
+from constants import CHARACTER_SCALING, RIGHTFACING, LEFTFACING
+from textures import texture_registry
+
+# Animation states of the player
+IDLE = "idle"
+WALK = "walk"
+JUMP = "jump"
+FALL = "fall"
+CLIMB = "climb"
+
+# How long each frame of an animated state is shown, in seconds. The
+# walk changes frame every 60th of a second and the climb every 15th,
+# the speeds they had when frames were counted in ticks.
+FRAME_DURATIONS = {
+    WALK: 1 / 60,
+    CLIMB: 4 / 60,
+}
+
+# Slack for the sums of frame times, so 60 ticks of 1/60 make a second
+FRAME_EPSILON = 1e-9
+
+
+def load_texture_pair(filename):
+    '''
+    Function to load a pair of mirror images for character animations.
+    Both come from the texture registry, so a second player doesn't
+    load anything again.
+    '''
+    return texture_registry.get_pair(filename)
+
+
+class PlayerCharacter(arcade.Sprite):
+    '''
+    Class for animations used for player character
+    '''
+    def __init__(self):
+
+        super().__init__()
+
+        # Default to facing right
+        self.character_facedirection = RIGHTFACING
+        self.scale = CHARACTER_SCALING
+
+        self.jumping = False
+        self.climbing = False
+        self.is_on_ladder = False
+        main_path = ("animations/tile")
+
+        idle_texture_pair = load_texture_pair(f"{main_path}_0139.png")
+        jump_texture_pair = load_texture_pair(f"{main_path}_jump.png")
+        fall_texture_pair = load_texture_pair(f"{main_path}_fall.png")
+        walk_textures = [load_texture_pair(f"{main_path}_walk{i}.png")
+                         for i in range(3)]
+        climbing_textures = [texture_registry.get(f"{main_path}_climb{i}.png")
+                             for i in range(2)]
+
+        # (state, facing, frame) -> texture, climbing looks the same
+        # either way
+        self.animation_textures = {}
+        self.frame_counts = {}
+        for facing in (RIGHTFACING, LEFTFACING):
+            frames = {
+                IDLE: [idle_texture_pair[facing]],
+                JUMP: [jump_texture_pair[facing]],
+                FALL: [fall_texture_pair[facing]],
+                WALK: [pair[facing] for pair in walk_textures],
+                CLIMB: climbing_textures,
+            }
+            for state, textures in frames.items():
+                self.frame_counts[state] = len(textures)
+                for frame, texture in enumerate(textures):
+                    self.animation_textures[(state, facing, frame)] = texture
+
+        # Time into the current walk or climb cycle, and the
+        # (state, facing, frame) of the texture shown
+        self.animation_time = 0.0
+        self.animation_key = (IDLE, RIGHTFACING, 0)
+
+        # Setting the texture when the character is idle
+        self.texture = self.animation_textures[self.animation_key]
+
+    def reset(self, spawn_point):
+        """
+        Put the player back at a spawn point, standing still and facing
+        right, the way a new player starts
+        """
+        self.position = spawn_point
+        self.change_x = 0
+        self.change_y = 0
+        self.character_facedirection = RIGHTFACING
+        self.jumping = False
+        self.climbing = False
+        self.is_on_ladder = False
+        self.animation_time = 0.0
+        self.animation_key = (IDLE, RIGHTFACING, 0)
+        self.texture = self.animation_textures[self.animation_key]
+
+    def set_animation(self, key, animation_time):
+        """
+        Show the (state, facing, frame) of a texture, with the time into
+        its walk or climb cycle
+        """
+        self.animation_time = animation_time
+        if key != self.animation_key:
+            self.animation_key = key
+            self.texture = self.animation_textures[key]
+
+    def animation_state(self):
+        """
+        Return the animation state the movement of the player calls for
+        """
+        if self.is_on_ladder:
+            return CLIMB
+        if self.change_y > 0:
+            return JUMP
+        if self.change_y < 0:
+            return FALL
+        if self.change_x == 0:
+            return IDLE
+        return WALK
+
+    def advance_animation(self, state, delta_time):
+        """
+        Move the walk or climb cycle on by delta_time
+        """
+        cycle = FRAME_DURATIONS[state] * self.frame_counts[state]
+        before = self.animation_time
+        self.animation_time += delta_time
+        if self.animation_time + FRAME_EPSILON >= cycle:
+            if before + FRAME_EPSILON < cycle:
+                self.animation_time -= cycle
+            else:
+                # Left over from the longer cycle of another state
+                self.animation_time = 0.0
+
+    def update_animation(self, delta_time: float = 1 / 60):
+        """
+        Function used to change textures when the player should be animated
+        """
+        # Changing if the character should face left or right
+        if self.change_x < 0:
+            self.character_facedirection = LEFTFACING
+        elif self.change_x > 0:
+            self.character_facedirection = RIGHTFACING
+
+        state = self.animation_state()
+        self.climbing = state == CLIMB
+
+        # Walking always moves the cycle on, climbing only while the
+        # player is going up or down the ladder
+        if state == WALK or (state == CLIMB and abs(self.change_y) > 1):
+            self.advance_animation(state, delta_time)
+
+        frame = 0
+        if state in FRAME_DURATIONS:
+            frame = int((self.animation_time + FRAME_EPSILON) /
+                        FRAME_DURATIONS[state])
+            frame = min(frame, self.frame_counts[state] - 1)
+
+        # The texture, and with it the hit box, only changes when the
+        # frame does
+        key = (state, self.character_facedirection, frame)
+        if key != self.animation_key:
+            self.animation_key = key
+            self.texture = self.animation_textures[key]
@@ -0,0 +1,150 @@
+"""
+Timing of each phase of a tick or frame, with rolling percentiles and
+a Chrome trace export
+
+Open a trace in chrome://tracing or https://ui.perfetto.dev to see the
+phases of every tick on a timeline.
+"""
+import json
+import time
+from collections import deque
+
+# Durations kept per phase for the rolling percentiles
+PROFILE_WINDOW = 300
+
+# Most phase timings kept for a trace, about five minutes of play
+MAX_TRACE_EVENTS = 200000
+
+# Percentiles shown by the overlay and written to the summary
+PERCENTILES = (50, 95, 99)
+
+
+class PhaseTimer:
+    '''
+    Class timing one phase, used as a context manager around its code
+    '''
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.record(self.name, self.start, time.perf_counter())
+        return False
+
+
+class NullPhase:
+    '''
+    Class standing in for a phase timer when nothing is being timed
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_PHASE = NullPhase()
+
+
+class Profiler:
+    '''
+    Class that keeps the last durations of every phase, and every
+    timing of the run when tracing
+    '''
+    def __init__(self, window=PROFILE_WINDOW, tracing=False):
+        self.window = window
+        self.tracing = tracing
+        self.enabled = True
+
+        # Phase name -> timer, and the last durations in milliseconds
+        self.timers = {}
+        self.durations = {}
+
+        # (name, start, end) of every phase timed while tracing
+        self.trace_events = []
+        self.origin = time.perf_counter()
+
+    def phase(self, name):
+        """
+        Return a context manager timing the code it wraps as a phase
+        """
+        if not self.enabled:
+            return NULL_PHASE
+        timer = self.timers.get(name)
+        if timer is None:
+            timer = self.timers[name] = PhaseTimer(self, name)
+            self.durations[name] = deque(maxlen=self.window)
+        return timer
+
+    def record(self, name, start, end):
+        """
+        Add a timing of a phase, start and end from time.perf_counter()
+        """
+        self.durations[name].append((end - start) * 1000)
+        if self.tracing and len(self.trace_events) < MAX_TRACE_EVENTS:
+            self.trace_events.append((name, start, end))
+
+    def percentiles(self, name, percentiles=PERCENTILES):
+        """
+        Return the given percentiles of the recent durations of a phase,
+        in milliseconds
+        """
+        durations = sorted(self.durations.get(name, ()))
+        if not durations:
+            return [0.0 for _ in percentiles]
+        last = len(durations) - 1
+        return [durations[round(last * percentile / 100)]
+                for percentile in percentiles]
+
+    def summary(self):
+        """
+        Return {phase: {count, mean, p50, p95, p99, max}} of the recent
+        durations, in milliseconds
+        """
+        summary = {}
+        for name, durations in self.durations.items():
+            if not durations:
+                continue
+            entry = {"count": len(durations),
+                     "mean": sum(durations) / len(durations)}
+            for percentile, value in zip(PERCENTILES,
+                                         self.percentiles(name)):
+                entry[f"p{percentile}"] = value
+            entry["max"] = max(durations)
+            summary[name] = entry
+        return summary
+
+    def write_trace(self, filename):
+        """
+        Write the traced phases as a Chrome trace, with the summary of
+        the recent durations alongside
+        """
+        events = []
+        for name, start, end in self.trace_events:
+            events.append({
+                "name": name, "cat": "game", "ph": "X", "pid": 1, "tid": 1,
+                "ts": (start - self.origin) * 1e6,
+                "dur": (end - start) * 1e6,
+            })
+        with open(filename, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"summary": self.summary()}}, file)
+
+
+class NullProfiler:
+    '''
+    Class with the profiler's phase() that times nothing, the default
+    so unprofiled runs don't pay for it
+    '''
+    enabled = False
+
+    def phase(self, name):
+        return NULL_PHASE
+
+
+NULL_PROFILER = NullProfiler()
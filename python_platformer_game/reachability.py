@@ -0,0 +1,1072 @@
+"""
+Check that every level can be finished, and find a par time for it
+
+The places the player can stand or hang on a ladder are found from the
+Platforms, Moving Platform, Ladders, Don't Touch and Coins layers and
+the teleporters of the Triggers layer of a map, with the hit boxes
+arcade gives the tile images. Jumps and falls between them are
+simulated with the physics constants of the game. The shortest route
+through the coins needed to finish the level is then searched for,
+exactly when there are few coins and by a quicker heuristic on bigger
+maps.
+
+The search is an approximation of the game:
+    - the player starts a jump from the middle of a tile or near one
+      of its sides, and holds left or right for all of it, lets go of
+      it or turns back part way through
+    - moving platforms are floors everywhere along their path, and can
+      be jumped through from below or the side
+    - enemies are left out
+    - a coin collected part way through a jump may be left by any jump
+      through it
+so a coin it can't reach is very likely out of reach in the game too.
+The time of the route is only an estimate of the best a run can do: the
+jumps searched may be slower than the best ones, or quicker than the
+game allows.
+
+The par time is a bound instead, no run can beat it. It is worked out
+from the player's top speed sideways and the teleporters alone, which
+hold whatever way they jump, so it is usually well short of the time
+of the route.
+
+Usage: python reachability.py [MAP.tmx ...]
+"""
+import argparse
+import glob
+import heapq
+import itertools
+import math
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import arcade
+import pytiled_parser
+
+from constants import (COINS_NEEDED, TILE_SCALING, CHARACTER_SCALING,
+                       GRAVITY, PLAYER_JUMP_SPEED, PLAYER_MOVEMENT_SPEED,
+                       LAYER_NAME_PLATORMS, LAYER_NAME_COINS,
+                       LAYER_NAME_DONT_TOUCH, LAYER_NAME_MOVING_PLATFORM,
+                       LAYER_NAME_LADDERS)
+from chunks import all_layers, tile_image, TILE_ID_MASK
+from clock import TICKS_PER_SECOND
+from triggers import (object_to_dict, triggers_from_objects,
+                      LAYER_NAME_TRIGGERS)
+
+# Half the size of the player's hit box in game pixels, from the box of
+# its standing frame
+PLAYER_HALF_WIDTH = 8.5 * CHARACTER_SCALING
+PLAYER_HALF_HEIGHT = 10.5 * CHARACTER_SCALING
+
+# Furthest the player's hit box can reach sideways from their middle in
+# any frame, half the width of the images
+PLAYER_REACH = 10.5 * CHARACTER_SCALING
+
+# Longest jump or fall followed, in ticks
+MAX_ARC_TICKS = 180
+
+# How left or right is held during a jump or fall, as (tick, then):
+# after the tick the player lets go when then is 0 and turns back when
+# it is -1. A tick of None holds it all the way.
+HOLD = (None, 0)
+AIR_CONTROLS = (HOLD, (6, 0), (12, 0), (8, -1), (16, -1))
+
+# Where in its tile the player starts a jump to the left or right, as
+# parts of a tile from the middle
+JUMP_OFFSETS = (-0.4, 0, 0.4)
+
+# Teleports followed one after another before giving up
+MAX_TELEPORTS = 4
+
+# Kinds of tile in the grid the player is checked against
+WALL = "wall"
+FLOOR = "floor"
+HAZARD = "hazard"
+COIN = "coin"
+TELEPORT = "teleport"
+LADDER = "ladder"
+
+# Slack for positions that land exactly on a tile edge
+EPSILON = 1e-6
+
+# Furthest from a tile that matters the clearance of the open tiles is
+# worked out to, in tiles
+MAX_CLEARANCE = 8
+
+
+# Most coins the quickest route through is searched for exactly, the
+# search takes time and memory that grow as 2 ** coins
+EXACT_ROUTE_COINS = 12
+
+# Most sets of coins a route may collect looked at for the time no run
+# can beat
+BOUND_COIN_SETS = 1000
+
+# Times a coin needed the quick route search may go to another coin
+# before giving up on a first coin
+NEAREST_TRIES = 50
+
+
+@dataclass
+class Flight:
+    '''
+    Class for the player moving through the air under those of the
+    controls given to LevelGraph.fly() that have moved them the same way
+    so far
+    '''
+    x: float
+    y: float
+    change_x: float
+    change_y: float
+    airborne: bool
+    # Coin -> tick it was first touched on
+    touches: dict
+    # Indices of the controls
+    controls: list
+
+
+class LevelGraph:
+    '''
+    Class holding the tiles of a map that matter for movement and the
+    moves between the places the player can rest
+    '''
+    def __init__(self, map_file):
+        tiled_map = pytiled_parser.parse_map(Path(map_file))
+        self.columns, self.rows = tiled_map.map_size
+        tile_width, tile_height = tiled_map.tile_size
+        self.tile_width = tile_width * TILE_SCALING
+        self.tile_height = tile_height * TILE_SCALING
+        map_height = self.rows * tile_height
+
+        # Hit boxes of tiles by (column, row), rows counted up from the
+        # bottom, as (left, bottom, right, top) in game pixels
+        self.walls = {}
+        self.floors = {}
+        self.dont_touch = {}
+        self.coin_boxes = {}
+        self.ladders = set()
+        self._offsets = {}
+        trigger_objects = []
+
+        for layer in all_layers(tiled_map.layers):
+            if isinstance(layer, pytiled_parser.TileLayer):
+                boxes = {}
+                for row, gids in enumerate(layer.data):
+                    row = self.rows - 1 - row
+                    for column, gid in enumerate(gids):
+                        if gid & TILE_ID_MASK:
+                            boxes[column, row] = self._tile_box(
+                                tiled_map, gid & TILE_ID_MASK, column, row)
+                if layer.name == LAYER_NAME_PLATORMS:
+                    self.walls.update(boxes)
+                elif layer.name == LAYER_NAME_DONT_TOUCH:
+                    self.dont_touch.update(boxes)
+                elif layer.name == LAYER_NAME_COINS:
+                    self.coin_boxes.update(boxes)
+                continue
+
+            objects = [object_to_dict(tiled_object)
+                       for tiled_object in layer.tiled_objects]
+            if layer.name == LAYER_NAME_TRIGGERS:
+                trigger_objects = objects
+            elif layer.name == LAYER_NAME_LADDERS:
+                for tiled_object in objects:
+                    self.ladders |= self._object_cells(tiled_object,
+                                                       map_height)
+            elif layer.name == LAYER_NAME_MOVING_PLATFORM:
+                for tiled_object in objects:
+                    gid = tiled_object["gid"] & TILE_ID_MASK
+                    for cell in self._path_cells(tiled_object, map_height):
+                        self.floors[cell] = self._tile_box(tiled_map, gid,
+                                                           *cell)
+
+        self.coins = sorted(self.coin_boxes,
+                            key=lambda cell: (-cell[1], cell[0]))
+        self.triggers, self.spawn_point = triggers_from_objects(
+            trigger_objects, map_height)
+        self.coin_index = {cell: index
+                           for index, cell in enumerate(self.coins)}
+
+        # Every hit box by the tiles it covers, with the kind of thing
+        # it is. Teleporters are found by their box.
+        self.grid = {}
+        for kind, boxes in ((WALL, self.walls), (FLOOR, self.floors),
+                            (HAZARD, self.dont_touch),
+                            (COIN, self.coin_boxes)):
+            for cell, box in boxes.items():
+                self.grid.setdefault(cell, []).append((kind, box))
+        for column, row in self.ladders:
+            self.grid.setdefault((column, row), []).append((LADDER, (
+                column * self.tile_width, row * self.tile_height,
+                (column + 1) * self.tile_width,
+                (row + 1) * self.tile_height)))
+        self.destinations = {}
+        for trigger in self.triggers.triggers:
+            if not trigger.destination:
+                continue
+            box = (trigger.left, trigger.bottom, trigger.right, trigger.top)
+            self.destinations[box] = trigger.destination
+            for column in range(int(box[0] // self.tile_width),
+                                int(box[2] // self.tile_width) + 1):
+                for row in range(int(box[1] // self.tile_height),
+                                 int(box[3] // self.tile_height) + 1):
+                    self.grid.setdefault((column, row), []).append(
+                        (TELEPORT, box))
+
+        # Tile -> how many tiles away the nearest tile in the grid is,
+        # counting diagonal steps as one, up to MAX_CLEARANCE
+        self.clearance = self._clearance()
+
+        # Node -> [(node, ticks, ((coin, tick), ...))], a node is the
+        # (column, row) of the tile the player's feet are in
+        self.edges = {}
+        self.start = self.settle(*self.spawn_point)
+        if self.start is not None:
+            self._explore(self.start[0])
+
+    def _clearance(self):
+        """
+        Return the distance from each tile of the map, and a margin
+        around it, to the nearest tile in the grid. Tiles next to one
+        have a clearance of 1.
+        """
+        clearance = {cell: 0 for cell in self.grid}
+        edge = list(clearance)
+        for distance in range(1, MAX_CLEARANCE + 1):
+            following = []
+            for column, row in edge:
+                for near in itertools.product((column - 1, column,
+                                               column + 1),
+                                              (row - 1, row, row + 1)):
+                    if near not in clearance and \
+                            -MAX_CLEARANCE <= near[0] < \
+                            self.columns + MAX_CLEARANCE and \
+                            -MAX_CLEARANCE <= near[1] < \
+                            self.rows + MAX_CLEARANCE:
+                        clearance[near] = distance
+                        following.append(near)
+            edge = following
+        return clearance
+
+    def _tile_box(self, tiled_map, gid, column, row):
+        """
+        Return the hit box of a tile, found from its image the way arcade
+        finds it
+        """
+        offsets = self._offsets.get(gid)
+        if offsets is None:
+            texture = arcade.load_texture(str(tile_image(tiled_map, gid)))
+            x_points = [point[0] * TILE_SCALING
+                        for point in texture.hit_box_points]
+            y_points = [point[1] * TILE_SCALING
+                        for point in texture.hit_box_points]
+            offsets = (min(x_points), min(y_points), max(x_points),
+                       max(y_points))
+            self._offsets[gid] = offsets
+        x = (column + 0.5) * self.tile_width
+        y = (row + 0.5) * self.tile_height
+        return (x + offsets[0], y + offsets[1], x + offsets[2],
+                y + offsets[3])
+
+    def _object_cells(self, tiled_object, map_height):
+        """
+        Return the tiles covered by a tile object, Tiled places it by
+        its bottom left corner
+        """
+        width = self.tile_width / TILE_SCALING
+        height = self.tile_height / TILE_SCALING
+        left = int(tiled_object["x"] // width)
+        bottom = int((map_height - tiled_object["y"]) // height)
+        right = left + max(int(tiled_object["width"] // width), 1)
+        top = bottom + max(int(tiled_object["height"] // height), 1)
+        return {(column, row) for column in range(left, right)
+                for row in range(bottom, top)}
+
+    def _path_cells(self, tiled_object, map_height):
+        """
+        Return every tile a moving platform covers on its way between
+        its boundaries
+        """
+        cells = self._object_cells(tiled_object, map_height)
+        properties = tiled_object["properties"]
+        columns = [column for column, _ in cells]
+        rows = [row for _, row in cells]
+        left, right = min(columns), max(columns)
+        bottom, top = min(rows), max(rows)
+        if "boundary_left" in properties:
+            left = min(left, int(float(properties["boundary_left"]) //
+                                 self.tile_width))
+        if "boundary_right" in properties:
+            right = max(right, int((float(properties["boundary_right"]) -
+                                    EPSILON) // self.tile_width))
+        if "boundary_bottom" in properties:
+            bottom = min(bottom, int(float(properties["boundary_bottom"]) //
+                                     self.tile_height))
+        if "boundary_top" in properties:
+            top = max(top, int((float(properties["boundary_top"]) -
+                                EPSILON) // self.tile_height))
+        return {(column, row) for column in range(left, right + 1)
+                for row in range(bottom, top + 1)}
+
+    def _touching(self, x, y):
+        """
+        Return the (kind, tile, hit box) of every tile the player's hit
+        box overlaps when centred at x, y
+        """
+        return self._overlapping(x - PLAYER_HALF_WIDTH,
+                                 y - PLAYER_HALF_HEIGHT,
+                                 x + PLAYER_HALF_WIDTH,
+                                 y + PLAYER_HALF_HEIGHT)
+
+    def _overlapping(self, left, bottom, right, top):
+        """
+        Return the (kind, tile, hit box) of every tile overlapping a box
+        """
+        tile_width, tile_height = self.tile_width, self.tile_height
+        left += EPSILON
+        right -= EPSILON
+        bottom += EPSILON
+        top -= EPSILON
+        rows = range(int(bottom // tile_height), int(top // tile_height) + 1)
+        grid = self.grid
+        found = []
+        for column in range(int(left // tile_width),
+                            int(right // tile_width) + 1):
+            for row in rows:
+                items = grid.get((column, row))
+                if items:
+                    for kind, box in items:
+                        if box[0] < right and box[2] > left and \
+                                box[1] < top and box[3] > bottom:
+                            found.append((kind, (column, row), box))
+        return found
+
+    def _open(self, left, bottom, right, top):
+        """
+        Return whether a box overlaps no tile, like _overlapping() but
+        without collecting them
+        """
+        tile_width, tile_height = self.tile_width, self.tile_height
+        left += EPSILON
+        right -= EPSILON
+        bottom += EPSILON
+        top -= EPSILON
+        rows = range(int(bottom // tile_height), int(top // tile_height) + 1)
+        grid = self.grid
+        for column in range(int(left // tile_width),
+                            int(right // tile_width) + 1):
+            for row in rows:
+                for _, box in grid.get((column, row), ()):
+                    if box[0] < right and box[2] > left and \
+                            box[1] < top and box[3] > bottom:
+                        return False
+        return True
+
+    def _blocked(self, x, y):
+        """
+        Return whether the player would be in a wall or hazard at x, y
+        """
+        return any(kind in (WALL, HAZARD)
+                   for kind, _, _ in self._touching(x, y))
+
+    def standing(self, node):
+        """
+        Return whether there is a floor under a node
+        """
+        column, row = node
+        return (column, row - 1) in self.walls or \
+            (column, row - 1) in self.floors
+
+    def position(self, node):
+        """
+        Return where the player stands in a node, in game pixels
+        """
+        column, row = node
+        return ((column + 0.5) * self.tile_width,
+                row * self.tile_height + PLAYER_HALF_HEIGHT)
+
+    def fly(self, x, y, change_x, change_y, controls=(HOLD,),
+            grounded=False, start=None, teleports=0):
+        """
+        Move the player the way the physics engine does until it lands,
+        grabs a ladder or dies, once for each of the controls. Returns a
+        (node, ticks, coin touches) for each control, or None where the
+        player dies or never lands.
+        """
+        results = [None] * len(controls)
+
+        # The controls that have moved the player the same way so far
+        # share a flight, it splits when one of them lets go or turns.
+        # Each flight is followed to its end before the next, with the
+        # tick it is at and whether it has just split off.
+        flights = [(Flight(x, y, change_x, change_y, not grounded, {},
+                           list(range(len(controls)))), 1, False)]
+        while flights:
+            flight, tick, split = flights.pop()
+            while tick <= MAX_ARC_TICKS:
+                turning = {}
+                if not split:
+                    for index in flight.controls:
+                        turn, then = controls[index]
+                        if (turn == tick - 1 and
+                                flight.change_x * then != flight.change_x):
+                            turning.setdefault(then, []).append(index)
+                split = False
+                for then, indices in turning.items():
+                    flight.controls = [index for index in flight.controls
+                                       if index not in indices]
+                    flights.append((Flight(
+                        flight.x, flight.y, flight.change_x * then,
+                        flight.change_y, flight.airborne,
+                        dict(flight.touches), indices), tick, True))
+                if not flight.controls:
+                    break
+
+                # Glide through the open until the next turn is due
+                turns = [controls[index][0] for index in flight.controls
+                         if controls[index][0] is not None and
+                         controls[index][0] >= tick]
+                last = min(turns, default=MAX_ARC_TICKS)
+                tick = self._glide(flight, tick, min(last, MAX_ARC_TICKS))
+                if tick is None:
+                    break
+                if tick > last:
+                    continue
+
+                finished, result = self._step(flight, tick, start,
+                                              teleports)
+                if finished:
+                    for index in flight.controls:
+                        results[index] = result
+                    break
+                tick += 1
+        return results
+
+    def _glide(self, flight, tick, last):
+        """
+        Move a flight on from a tick up to the last one given, for as
+        long as nothing is near enough to touch. Returns the first tick
+        not moved through, or None if the player fell out of the map.
+        """
+        tile_width, tile_height = self.tile_width, self.tile_height
+        clearance = self.clearance
+        x, y = flight.x, flight.y
+        change_x, change_y = flight.change_x, flight.change_y
+        airborne = flight.airborne
+
+        while tick <= last:
+            # Neither of the moves _step() makes can touch anything while
+            # the player's middle stays in a square of tiles with nothing
+            # next to them before and after moving sideways. The hit box
+            # reaches less than a tile from the middle.
+            column = int(x // tile_width)
+            row = int(y // tile_height)
+            reach = clearance.get((column, row), 0) - 2
+            if reach >= 0:
+                left = (column - reach) * tile_width
+                bottom = (row - reach) * tile_height
+                right = (column + reach + 1) * tile_width
+                top = (row + reach + 1) * tile_height
+                first = tick
+                while tick <= last:
+                    moved_x = x + change_x
+                    moved_y = y + (change_y - GRAVITY)
+                    if not (left <= moved_x <= right and
+                            bottom <= moved_y <= top):
+                        break
+                    change_y -= GRAVITY
+                    x, y = moved_x, moved_y
+                    tick += 1
+                if tick > first:
+                    airborne = airborne or change_y <= 0
+                    if y < -tile_height:
+                        return None
+                    continue
+
+            # Else the box both moves cover has to overlap no tile
+            moved_x = x + change_x
+            moved_y = y + (change_y - GRAVITY)
+            if not self._open(min(x, moved_x) - PLAYER_HALF_WIDTH,
+                              moved_y - PLAYER_HALF_HEIGHT,
+                              max(x, moved_x) + PLAYER_HALF_WIDTH,
+                              moved_y + PLAYER_HALF_HEIGHT):
+                break
+            change_y -= GRAVITY
+            x, y = moved_x, moved_y
+            airborne = airborne or change_y <= 0
+            if y < -tile_height:
+                return None
+            tick += 1
+        flight.x, flight.y = x, y
+        flight.change_y = change_y
+        flight.airborne = airborne
+        return tick
+
+    def _step(self, flight, tick, start, teleports):
+        """
+        Move a flight on by one tick. Returns (True, what fly() returns
+        for it) once it has ended, else (False, None).
+        """
+        tile_width, tile_height = self.tile_width, self.tile_height
+        x, y = flight.x, flight.y
+        change_x, change_y = flight.change_x, flight.change_y
+        airborne = flight.airborne
+        touches = flight.touches
+
+        # Up or down first, the way arcade moves a sprite. Moving
+        # platforms only hold the player up from above.
+        landed = False
+        change_y -= GRAVITY
+        old_bottom = y - PLAYER_HALF_HEIGHT
+        y += change_y
+        if change_y > 0:
+            hit = [box for kind, _, box in self._touching(x, y)
+                   if kind == WALL]
+            if hit:
+                y = min(box[1] for box in hit) - PLAYER_HALF_HEIGHT
+                change_y = 0
+        else:
+            hit = [box for kind, _, box in self._touching(x, y)
+                   if kind == WALL or kind == FLOOR and
+                   box[3] <= old_bottom + EPSILON]
+            if hit:
+                y = max(box[3] for box in hit) + PLAYER_HALF_HEIGHT
+                change_y = 0
+                landed = airborne
+            else:
+                airborne = True
+
+        # arcade lifts a sprite onto a ledge or a moving platform as
+        # high as the distance it moves sideways. A moving platform
+        # too high to step onto is passed through.
+        x += change_x
+        touching = self._touching(x, y)
+        hit = [box for kind, _, box in touching if kind == WALL]
+        ledges = hit + [box for kind, _, box in touching
+                        if kind == FLOOR]
+        if ledges:
+            raised = max(box[3] for box in ledges) + PLAYER_HALF_HEIGHT
+            if raised - y <= abs(change_x) + EPSILON and not any(
+                    kind == WALL for kind, _, _ in
+                    self._touching(x, raised)):
+                y = raised
+            elif not hit:
+                pass
+            elif change_x > 0:
+                x = min(box[0] for box in hit) - PLAYER_HALF_WIDTH
+            else:
+                x = max(box[2] for box in hit) + PLAYER_HALF_WIDTH
+            touching = self._touching(x, y)
+
+        if y < -tile_height:
+            return True, None
+        destination = None
+        ladders = []
+        for kind, cell, box in touching:
+            if kind == HAZARD:
+                return True, None
+            if kind == COIN:
+                touches.setdefault(self.coin_index[cell], tick)
+            elif kind == TELEPORT:
+                destination = self.destinations[box]
+            elif kind == LADDER and not (
+                    start in self.ladders and cell[0] == start[0]):
+                ladders.append(cell)
+
+        if destination is not None:
+            if teleports >= MAX_TELEPORTS:
+                return True, None
+            found = self.fly(*destination, 0, 0,
+                             teleports=teleports + 1)[0]
+            return True, self._join(tick, touches, found)
+
+        # The player grabs a ladder they touch, other than the one
+        # they start on, at the height of their feet
+        row = (y - PLAYER_HALF_HEIGHT) / tile_height
+        if ladders:
+            node = min(ladders, key=lambda cell: abs(cell[1] - row))
+            return True, (node, tick, tuple(touches.items()))
+        if landed:
+            return True, ((int(x // tile_width), int(round(row))), tick,
+                          tuple(touches.items()))
+        flight.x, flight.y = x, y
+        flight.change_x, flight.change_y = change_x, change_y
+        flight.airborne = airborne
+        return False, None
+
+    def _destination(self, x, y):
+        """
+        Return where a teleporter the player is in at x, y sends them
+        """
+        for kind, _, box in self._touching(x, y):
+            if kind == TELEPORT:
+                return self.destinations[box]
+        return None
+
+    @staticmethod
+    def _join(ticks, touches, found):
+        """
+        Add a move to the ticks and coins of the move before it
+        """
+        if found is None:
+            return None
+        node, more_ticks, more_touches = found
+        touches = dict(touches)
+        for coin, tick in more_touches:
+            touches.setdefault(coin, ticks + tick)
+        return node, ticks + more_ticks, tuple(touches.items())
+
+    def settle(self, x, y):
+        """
+        Return the node the player ends up in when let go at x, y
+        """
+        return self.fly(x, y, 0, 0)[0]
+
+    def _arrive(self, node, ticks):
+        """
+        Return the move into a node reached by walking or climbing,
+        following a teleporter there
+        """
+        x, y = self.position(node)
+        touches = tuple((self.coin_index[cell], ticks)
+                        for kind, cell, _ in self._touching(x, y)
+                        if kind == COIN)
+        destination = self._destination(x, y)
+        if destination is not None:
+            return self._join(ticks, touches,
+                              self.fly(*destination, 0, 0)[0])
+        return node, ticks, touches
+
+    def _moves(self, node):
+        """
+        Return every move out of a node
+        """
+        column, row = node
+        x, y = self.position(node)
+        standing = self.standing(node)
+        walk_ticks = self.tile_width / PLAYER_MOVEMENT_SPEED
+        climb_ticks = self.tile_height / PLAYER_MOVEMENT_SPEED
+        moves = []
+
+        for direction in (-1, 1):
+            side = (column + direction, row)
+            if side in self.walls or side in self.dont_touch:
+                continue
+            if side in self.ladders or self.standing(side):
+                moves.append(self._arrive(side, walk_ticks))
+            else:
+                # Walk off the edge
+                moves.extend(self.fly(
+                    x, y, direction * PLAYER_MOVEMENT_SPEED, 0,
+                    AIR_CONTROLS, grounded=standing, start=node))
+
+        if node in self.ladders:
+            for direction in (-1, 1):
+                other = (column, row + direction)
+                if other in self.walls or other in self.dont_touch:
+                    continue
+                if other in self.ladders or self.standing(other):
+                    moves.append(self._arrive(other, climb_ticks))
+
+            # Climbing off to the side keeps the climbing speed, and the
+            # player can climb until their feet are at the top
+            hops = [(y, 0)]
+            if (column, row + 1) not in self.ladders:
+                hops.append((y + self.tile_height, climb_ticks))
+            for hop_y, ticks in hops:
+                for direction in (-1, 1):
+                    moves.extend(self._join(ticks, (), found)
+                                 for found in self.fly(
+                                     x, hop_y,
+                                     direction * PLAYER_MOVEMENT_SPEED,
+                                     PLAYER_MOVEMENT_SPEED, AIR_CONTROLS,
+                                     start=node))
+
+        if standing:
+            moves.extend(self.fly(x, y, 0, PLAYER_JUMP_SPEED, start=node))
+            for offset in JUMP_OFFSETS:
+                # Walk there first, if nothing is in the way
+                jump_x = x + offset * self.tile_width
+                if offset and self._blocked(jump_x, y):
+                    continue
+                walk = abs(offset) * self.tile_width / PLAYER_MOVEMENT_SPEED
+                for direction in (-1, 1):
+                    moves.extend(self._join(walk, (), found)
+                                 for found in self.fly(
+                                     jump_x, y,
+                                     direction * PLAYER_MOVEMENT_SPEED,
+                                     PLAYER_JUMP_SPEED, AIR_CONTROLS,
+                                     start=node))
+
+        # The quickest move to each node past each set of coins
+        best = {}
+        for move in moves:
+            if move is None or move[0] == node and not move[2]:
+                continue
+            key = (move[0], frozenset(coin for coin, _ in move[2]))
+            if key not in best or move[1] < best[key][1]:
+                best[key] = move
+        return list(best.values())
+
+    def _explore(self, start):
+        pending = [start]
+        while pending:
+            node = pending.pop()
+            if node in self.edges:
+                continue
+            x, y = self.position(node)
+            if any(kind == HAZARD for kind, _, _ in self._touching(x, y)):
+                self.edges[node] = []
+                continue
+            self.edges[node] = self._moves(node)
+            for target, _, _ in self.edges[node]:
+                if target not in self.edges:
+                    pending.append(target)
+
+    def coin_graph(self):
+        """
+        Return the moves as a graph whose nodes also include the coins,
+        each coin standing for every move that touches it. The fall from
+        the spawn point is the one move out of the "spawn" node.
+        """
+        graph = {node: [] for node in self.edges}
+        graph["spawn"] = []
+        for index in range(len(self.coins)):
+            graph[("coin", index)] = []
+        moves = list(self.edges.items())
+        if self.start is not None:
+            moves.append(("spawn", [self.start]))
+        for node, node_moves in moves:
+            for target, ticks, touches in node_moves:
+                graph[node].append((target, ticks))
+                for coin, tick in touches:
+                    graph[node].append((("coin", coin), tick))
+                    graph[("coin", coin)].append((target, ticks - tick))
+        return graph
+
+
+def shortest_ticks(graph, source):
+    '''
+    Function to find the fewest ticks from a node to every other one
+    '''
+    ticks = {source: 0}
+    # Nodes are tuples and strings, the count breaks ties between them
+    order = itertools.count()
+    queue = [(0, next(order), source)]
+    while queue:
+        cost, _, node = heapq.heappop(queue)
+        if cost > ticks[node]:
+            continue
+        for target, step in graph[node]:
+            total = cost + step
+            if total < ticks.get(target, float("inf")):
+                ticks[target] = total
+                heapq.heappush(queue, (total, next(order), target))
+    return ticks
+
+
+def best_route(start_ticks, between, needed):
+    '''
+    Function to find the quickest order to collect the coins needed,
+    from the ticks to each coin from the start and between coins.
+    Returns (ticks, [coin, ...]), or None if too few can be reached.
+    Up to EXACT_ROUTE_COINS coins every order is tried, past that
+    quick_route() finds a route that may not be the quickest.
+    '''
+    coins = sorted(start_ticks)
+    if len(coins) < needed:
+        return None
+    if needed == 0:
+        return 0, []
+    if len(coins) > EXACT_ROUTE_COINS:
+        return quick_route(start_ticks, between, needed)
+
+    # (coins collected as bits, last coin) -> (ticks, previous coin)
+    best = {(1 << bit, bit): (start_ticks[coin], None)
+            for bit, coin in enumerate(coins)}
+    layer = list(best)
+    for _ in range(needed - 1):
+        following = {}
+        for state in layer:
+            mask, last = state
+            ticks = best[state][0]
+            for bit, coin in enumerate(coins):
+                if mask & (1 << bit):
+                    continue
+                step = between[coins[last]].get(coin)
+                if step is None:
+                    continue
+                key = (mask | (1 << bit), bit)
+                if key not in following or ticks + step < following[key][0]:
+                    following[key] = (ticks + step, state)
+        best.update(following)
+        layer = list(following)
+    if not layer:
+        return None
+
+    state = min(layer, key=lambda state: best[state][0])
+    total = best[state][0]
+    route = []
+    while state is not None:
+        route.append(coins[state[1]])
+        state = best[state][1]
+    return total, route[::-1]
+
+
+def route_ticks(start_ticks, between, route):
+    '''
+    Function to add up the ticks of a route through coins, infinite if
+    one of its moves can't be made
+    '''
+    total = start_ticks[route[0]]
+    for coin, following in zip(route, route[1:]):
+        step = between[coin].get(following)
+        if step is None:
+            return float("inf")
+        total += step
+    return total
+
+
+def nearest_route(first, between, needed):
+    '''
+    Function to make a route of the coins needed from a first coin,
+    going to the nearest coin not yet collected each time. When the
+    route gets stuck, as past a drop the player can't climb back up, it
+    goes back and tries the next nearest instead, up to NEAREST_TRIES
+    times a coin needed. Returns the route, or None.
+    '''
+    def nearest(coin, route):
+        steps = between[coin]
+        return sorted((other for other in steps if other not in route),
+                      key=lambda other: (steps[other], other))
+
+    route = [first]
+    choices = [nearest(first, route)]
+    tries = NEAREST_TRIES * needed
+    while len(route) < needed:
+        if not route or not tries:
+            return None
+        if choices[-1]:
+            coin = choices[-1].pop(0)
+            route.append(coin)
+            choices.append(nearest(coin, route))
+            tries -= 1
+        else:
+            route.pop()
+            choices.pop()
+    return route
+
+
+def quick_route(start_ticks, between, needed):
+    '''
+    Function to find a quick route through the coins needed when there
+    are too many to try every order. A route is made from each first
+    coin by nearest_route(), then the best of them is shortened by
+    reversing parts of it (2-opt) for as long as that helps. Returns
+    the same as best_route().
+    '''
+    best = None
+    for first in sorted(start_ticks):
+        route = nearest_route(first, between, needed)
+        if route:
+            ticks = route_ticks(start_ticks, between, route)
+            if best is None or ticks < best[0]:
+                best = (ticks, route)
+    if best is None:
+        return None
+
+    ticks, route = best
+    improved = True
+    while improved:
+        improved = False
+        for start in range(len(route) - 1):
+            for end in range(start + 2, len(route) + 1):
+                changed = (route[:start] + route[start:end][::-1] +
+                           route[end:])
+                changed_ticks = route_ticks(start_ticks, between, changed)
+                if changed_ticks < ticks:
+                    ticks, route = changed_ticks, changed
+                    improved = True
+    return ticks, route
+
+
+def sideways_ticks(level):
+    '''
+    Function to find the fewest ticks from the spawn point and from each
+    coin to every coin, moving sideways at the player's top speed and
+    going through any teleporter on the way. Everything else about the
+    map is left out, so no run gets there quicker. Returns the ticks
+    from the start and between coins the way best_route() takes them.
+    '''
+    # Node -> (left, right) of where the player's middle is while they
+    # touch it, a teleporter sends them to its arrival
+    spans = {"spawn": (level.spawn_point[0], level.spawn_point[0])}
+    for coin, cell in enumerate(level.coins):
+        box = level.coin_boxes[cell]
+        spans["coin", coin] = (box[0] - PLAYER_REACH, box[2] + PLAYER_REACH)
+    arrivals = {}
+    for number, trigger in enumerate(level.triggers.triggers):
+        if trigger.destination:
+            spans["teleport", number] = (trigger.left - PLAYER_REACH,
+                                         trigger.right + PLAYER_REACH)
+            spans["arrival", number] = (trigger.destination[0],
+                                        trigger.destination[0])
+            arrivals["teleport", number] = ("arrival", number)
+
+    def shortest(source):
+        # The player can be anywhere in a coin while they touch it, so
+        # only the coin gone from is moved on from
+        ticks = {source: 0}
+        order = itertools.count()
+        queue = [(0, next(order), source)]
+        while queue:
+            cost, _, node = heapq.heappop(queue)
+            if cost > ticks[node] or node[0] == "coin" and node != source:
+                continue
+            if node in arrivals:
+                steps = [(arrivals[node], 0)]
+            else:
+                left, right = spans[node]
+                steps = [(other, max(0, other_left - right,
+                                     left - other_right) /
+                          PLAYER_MOVEMENT_SPEED)
+                         for other, (other_left, other_right)
+                         in spans.items()]
+            for target, step in steps:
+                if cost + step < ticks.get(target, float("inf")):
+                    ticks[target] = cost + step
+                    heapq.heappush(queue, (cost + step, next(order), target))
+        return {coin: ticks["coin", coin] for coin in range(len(level.coins))}
+
+    between = {}
+    for coin in range(len(level.coins)):
+        between[coin] = shortest(("coin", coin))
+        del between[coin][coin]
+    return shortest("spawn"), between
+
+
+def least_ticks(start_ticks, between, needed):
+    '''
+    Function to find ticks no route through the coins needed can take
+    fewer of, from the ticks to each coin from the start and between
+    coins. A route gets to each of its coins, and to each two of them
+    one after the other, so it takes at least as long as the slowest of
+    those. Every set of coins it may collect is tried, up to
+    BOUND_COIN_SETS of them, past that only the ticks to each coin on
+    its own are used.
+    '''
+    if needed == 0:
+        return 0
+
+    def both(coin, other):
+        if coin == other:
+            return start_ticks[coin]
+        return min(start_ticks[coin] + between[coin][other],
+                   start_ticks[other] + between[other][coin])
+
+    coins = sorted(start_ticks)
+    if math.comb(len(coins), needed) > BOUND_COIN_SETS:
+        return sorted(start_ticks.values())[needed - 1]
+    return min(max(both(coin, other) for coin, other in
+                   itertools.combinations_with_replacement(chosen, 2))
+               for chosen in itertools.combinations(coins, needed))
+
+
+def analyze(map_file, needed=None):
+    '''
+    Function to check a map. Returns a dict with the coins that can't
+    be reached, the quickest route found through the coins and its
+    estimated time, and the par time no run can beat. The coins needed
+    are those of the level the map is named for unless given.
+    '''
+    start = time.perf_counter()
+    level = LevelGraph(map_file)
+    coins = range(len(level.coins))
+    if needed is None:
+        match = re.search(r"level_(\d+)", os.path.basename(map_file))
+        needed = len(level.coins)
+        if match:
+            needed = COINS_NEEDED.get(int(match.group(1)), needed)
+
+    reachable = {}
+    between = {}
+    if level.start is not None:
+        graph = level.coin_graph()
+        from_start = shortest_ticks(graph, "spawn")
+        reachable = {coin: from_start[("coin", coin)]
+                     for coin in coins if ("coin", coin) in from_start}
+        for coin in reachable:
+            ticks = shortest_ticks(graph, ("coin", coin))
+            between[coin] = {other: ticks[("coin", other)]
+                             for other in reachable
+                             if other != coin and ("coin", other) in ticks}
+
+    route = best_route(reachable, between, min(needed, len(level.coins)))
+
+    # The clock stops before the tick the last coin is collected on
+    par = max(math.ceil(least_ticks(*sideways_ticks(level),
+                                    min(needed, len(level.coins))) -
+                        EPSILON) - 1, 0)
+
+    # The route can't be quicker than the par time, its estimate only
+    # is when the search lets the player move quicker than the game
+    route_ticks = max(route[0], par) if route else None
+
+    def tile(coin):
+        # As Tiled shows it, rows counted down from the top
+        column, row = level.coins[coin]
+        return column, level.rows - 1 - row
+
+    return {
+        "map": map_file,
+        "nodes": len(level.edges),
+        "coins": len(level.coins),
+        "needed": needed,
+        "reachable": len(reachable),
+        "unreachable": [tile(coin) for coin in coins
+                        if coin not in reachable],
+        "completable": route is not None and len(level.coins) >= needed,
+        "par_ticks": par,
+        "par_seconds": par / TICKS_PER_SECOND,
+        "route": [tile(coin) for coin in route[1]] if route else None,
+        "route_ticks": round(route_ticks) if route else None,
+        "route_seconds": (route_ticks / TICKS_PER_SECOND) if route else None,
+        "elapsed_ms": (time.perf_counter() - start) * 1000,
+    }
+
+
+def main(argv=None):
+    """
+    Check every map given, or every level map in this directory
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument("maps", nargs="*")
+    parser.add_argument("--needed", type=int,
+                        help="coins needed to finish a level, by default "
+                        "those of the level the map is named for")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for map_file in args.maps or sorted(glob.glob("map1_level_*.tmx")):
+        report = analyze(map_file, args.needed)
+        print(f"{map_file}: {report['reachable']} of {report['coins']} "
+              f"coins reachable from {report['nodes']} places "
+              f"({report['elapsed_ms']:.0f} ms)")
+        for column, row in report["unreachable"]:
+            print(f"    coin at tile ({column}, {row}) can't be reached")
+        if report["completable"]:
+            print(f"    par time {report['par_seconds']:.2f}s, route found "
+                  f"takes {report['route_seconds']:.2f}s, coins in order "
+                  f"{report['route']}")
+        else:
+            print(f"    can't be finished, {report['needed']} coins needed")
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Recording of the per-tick input and a runner that replays it headlessly
+
+A recording is a fixed size header followed by one byte per tick. The
+low four bits of each byte are the input mask given to the simulation,
+bit 4 is the jump_needs_reset flag the simulation had after the tick,
+which is used to spot a replay drifting from the original run.
+
+Usage: python replay.py RECORDING [RECORDING ...] [--trace FILE]
+"""
+import argparse
+import struct
+import sys
+import time
+
+from simulation import Simulation, FIXED_DT
+from level_cache import LevelCache
+from profiler import Profiler, NULL_PROFILER
+
+MAGIC = b"PLRP"
+VERSION = 2
+
+# magic, version, start level, end level, game complete, ticks per
+# second, rng seed, tick count, score, deaths, level time in ticks
+HEADER = struct.Struct("<4sBBBBHIIIII")
+
+INPUT_MASK = 0x0F
+JUMP_RESET_BIT = 0x10
+
+
+class Recording:
+    '''
+    Class holding the inputs of one run and the results it ended with
+    '''
+    def __init__(self, start_level=1, seed=0):
+        self.start_level = start_level
+        self.seed = seed
+        self.ticks_per_second = round(1 / FIXED_DT)
+        self.ticks = bytearray()
+
+        # Results of the run, filled in by finish()
+        self.end_level = start_level
+        self.game_complete = False
+        self.score = 0
+        self.death = 0
+        self.time_ticks = 0
+
+    def record(self, keys, simulation):
+        """
+        Add the input of a tick that has just been simulated
+        """
+        value = keys & INPUT_MASK
+        if simulation.jump_needs_reset:
+            value |= JUMP_RESET_BIT
+        self.ticks.append(value)
+
+    def finish(self, simulation):
+        """
+        Store the results the run ended with
+        """
+        self.end_level = simulation.level
+        self.game_complete = simulation.game_complete
+        self.score = simulation.score
+        self.death = simulation.death
+        self.time_ticks = simulation.clock.ticks
+
+    def to_bytes(self):
+        header = HEADER.pack(MAGIC, VERSION, self.start_level,
+                             self.end_level, self.game_complete,
+                             self.ticks_per_second, self.seed,
+                             len(self.ticks), self.score, self.death,
+                             self.time_ticks)
+        return header + bytes(self.ticks)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, version = struct.unpack_from("<4sB", data)
+        if magic != MAGIC:
+            raise ValueError("Not a recording file")
+        if version != VERSION:
+            raise ValueError(f"Unsupported recording version {version}")
+        (magic, version, start_level, end_level, game_complete,
+         ticks_per_second, seed, tick_count, score, death,
+         time_ticks) = HEADER.unpack_from(data)
+        if ticks_per_second != round(1 / FIXED_DT):
+            raise ValueError(f"Recording runs at {ticks_per_second} ticks "
+                             f"per second, the game at {round(1 / FIXED_DT)}")
+
+        ticks = data[HEADER.size:HEADER.size + tick_count]
+        if len(ticks) != tick_count:
+            raise ValueError("Recording is truncated")
+
+        recording = cls(start_level, seed)
+        recording.ticks = bytearray(ticks)
+        recording.end_level = end_level
+        recording.game_complete = bool(game_complete)
+        recording.score = score
+        recording.death = death
+        recording.time_ticks = time_ticks
+        return recording
+
+    def save(self, filename):
+        with open(filename, "wb") as file:
+            file.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, "rb") as file:
+            return cls.from_bytes(file.read())
+
+
+def replay(recording, level_cache=None, profiler=NULL_PROFILER):
+    '''
+    Function to run a recording through a new simulation.
+    Returns the simulation and a list of differences from the recording.
+    '''
+    simulation = Simulation(recording.start_level, level_cache, profiler)
+    problems = []
+
+    for tick, value in enumerate(recording.ticks):
+        with profiler.phase("step"):
+            simulation.step(value & INPUT_MASK)
+        if bool(value & JUMP_RESET_BIT) != simulation.jump_needs_reset:
+            problems.append(f"jump state differs from tick {tick}")
+            break
+
+    expected = Recording(recording.start_level, recording.seed)
+    expected.finish(simulation)
+    for name in ("end_level", "game_complete", "score", "death",
+                 "time_ticks"):
+        if getattr(expected, name) != getattr(recording, name):
+            problems.append(f"{name} is {getattr(expected, name)!r}, "
+                            f"recorded {getattr(recording, name)!r}")
+    return simulation, problems
+
+
+def main(argv=None):
+    """
+    Replay recordings as fast as possible and check their results
+    """
+    parser = argparse.ArgumentParser(description=__doc__.strip().split(
+        "\n")[0])
+    parser.add_argument("recordings", nargs="+")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="save the time taken by each phase of every "
+                             "tick as a Chrome trace")
+    args = parser.parse_args(argv)
+
+    # Every recording shares the parsed levels
+    level_cache = LevelCache()
+    failed = 0
+
+    profiler = NULL_PROFILER
+    if args.trace:
+        # Percentiles cover the whole run, not just the last few ticks
+        total_ticks = sum(len(Recording.load(filename).ticks)
+                          for filename in args.recordings)
+        profiler = Profiler(window=max(total_ticks, 1), tracing=True)
+
+    for filename in args.recordings:
+        recording = Recording.load(filename)
+        start = time.perf_counter()
+        simulation, problems = replay(recording, level_cache, profiler)
+        elapsed = time.perf_counter() - start
+
+        status = "FAIL" if problems else "OK"
+        print(f"{status} {filename}: {len(recording.ticks)} ticks in "
+              f"{elapsed:.2f}s, level {simulation.level}, score "
+              f"{simulation.score}, deaths {simulation.death}, time "
+              f"{simulation.total_time:.2f}")
+        for problem in problems:
+            print(f"    {problem}")
+        if problems:
+            failed += 1
+
+    if args.trace:
+        print("phase            p50      p95      p99      max ms")
+        for name, entry in profiler.summary().items():
+            print(f"{name:<14}{entry['p50']:8.3f} {entry['p95']:8.3f} "
+                  f"{entry['p99']:8.3f} {entry['max']:8.3f}")
+        profiler.write_trace(args.trace)
+        print(f"Wrote {args.trace}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,438 @@
+"""
+Game logic that runs without a window, stepped on a fixed timestep
+"""
+import arcade
+
+from constants import (PLAYER_MOVEMENT_SPEED, GRAVITY,
+                       PLAYER_JUMP_SPEED, LAYER_NAME_COINS,
+                       LAYER_NAME_BACKGROUND, LAYER_NAME_ENEMIES,
+                       LAYER_NAME_MOVING_PLATFORM, LAYER_NAME_LADDERS,
+                       LAYER_NAME_PLAYER, LAYER_NAME_DONT_TOUCH)
+from level_cache import LevelCache
+from player import PlayerCharacter
+from profiler import NULL_PROFILER
+from clock import GameClock, TICKS_PER_SECOND
+from snapshot import Snapshot
+from contacts import PlayerContacts
+
+# Length of one simulation step
+FIXED_DT = 1 / TICKS_PER_SECOND
+
+# Bits of the input mask, one per direction key
+INPUT_UP = 1
+INPUT_DOWN = 2
+INPUT_LEFT = 4
+INPUT_RIGHT = 8
+
+LAST_LEVEL = 3
+
+# Coins still to collect on a level when the next one starts loading in
+# the background, so moving on to it fits in one frame
+PRELOAD_COINS_LEFT = 3
+
+# Events a step can report, the window plays a sound for each of them
+EVENT_JUMP = "jump"
+EVENT_COIN = "coin"
+EVENT_DEATH = "death"
+EVENT_TELEPORT = "teleport"
+EVENT_LEVEL_COMPLETE = "level_complete"
+EVENT_GAME_COMPLETE = "game_complete"
+
+
+class Simulation:
+    '''
+    Class that owns the level, player and physics and runs the game
+    rules one fixed step at a time, with no window or OpenGL context
+    '''
+    def __init__(self, level=1, level_cache=None, profiler=NULL_PROFILER):
+
+        # Parsed levels, can be shared between simulations
+        if level_cache is None:
+            level_cache = LevelCache()
+        self.level_cache = level_cache
+
+        # Times the phases of each step
+        self.profiler = profiler
+
+        # To keep track of time on each level, in ticks. The time
+        # taken by each finished level is kept in split_ticks.
+        self.clock = GameClock()
+        self.split_ticks = {}
+        self.displaytotaltime = 0
+
+        # Current input mask and the derived key state
+        self.keys = 0
+        self.left_pressed = False
+        self.right_pressed = False
+        self.up_pressed = False
+        self.down_pressed = False
+        self.jump_needs_reset = False
+
+        # Things that happened during the last step
+        self.events = []
+
+        # Set once the last level has been finished
+        self.game_complete = False
+
+        # Number of steps run since the simulation was created
+        self.tick = 0
+
+        self.current_level = None
+        self.scene = None
+        self.tile_map = None
+
+        # The player is made once and put back at the spawn point on
+        # every respawn. The physics engine is made again only when
+        # the level changes.
+        self.player_sprite = PlayerCharacter()
+        self.physics_engine = None
+
+        # Answers of the physics engine's contact queries, kept until
+        # the next physics step
+        self.contacts = None
+
+        # Background of the trigger region the player is in, if any
+        self.background = None
+
+        # Keep track of the score, death and level
+        self.score = 0
+        self.death = 0
+        self.level = level
+
+        # Where the player was when they last died
+        self.death_position = None
+
+        self.setup()
+
+    def setup(self):
+        """
+        Set up the current level. Call this function to restart it.
+        """
+
+        # Get the parsed level, only the first visit reads the TMX file.
+        # Coins, enemies and moving platforms are put back to their start.
+        level = self.level_cache.get(self.level)
+        new_level = level is not self.current_level
+        self.current_level = level
+        self.tile_map = level.tile_map
+        self.scene = level.scene
+        self.background = None
+
+        # Keep track of the score in the level
+        self.score = 0
+
+        # Keep track of time of level
+        self.displaytotaltime = 0
+        self.clock.reset()
+
+        # Set up the player at the spawn point of the level. A cached
+        # level may still hold the player of another simulation.
+        self.player_sprite.reset(level.spawn_point)
+        player_list = self.scene[LAYER_NAME_PLAYER]
+        if list(player_list) != [self.player_sprite]:
+            self.player_sprite.remove_from_sprite_lists()
+            player_list.clear()
+            player_list.append(self.player_sprite)
+
+        if new_level or self.physics_engine is None:
+            # The lists are wrapped so the engine keeps them even while
+            # they are empty, a streamed level fills them in as chunks
+            # load. Only the movers near the player are given to the
+            # engine.
+            self.physics_engine = arcade.PhysicsEnginePlatformer(
+                self.player_sprite,
+                platforms=[level.near_movers(LAYER_NAME_MOVING_PLATFORM)],
+                gravity_constant=GRAVITY,
+                ladders=[self.scene[LAYER_NAME_LADDERS]],
+                walls=[self.scene["Platforms"]]
+            )
+            self.physics_engine.platforms.append(
+                level.near_movers(LAYER_NAME_ENEMIES))
+            self.contacts = PlayerContacts(self.physics_engine)
+        else:
+            self.physics_engine.jumps_since_ground = 0
+            self.contacts.invalidate()
+
+    def capture(self, snapshot=None):
+        """
+        Copy the state of the game into a snapshot, a new one if none is
+        given, and return it
+        """
+        if snapshot is None:
+            snapshot = Snapshot()
+        level = self.current_level
+        player = self.player_sprite
+
+        snapshot.level = self.level
+        snapshot.tick = self.tick
+        snapshot.keys = self.keys
+        snapshot.jump_needs_reset = self.jump_needs_reset
+        snapshot.score = self.score
+        snapshot.death = self.death
+        snapshot.clock_ticks = self.clock.ticks
+        if snapshot.split_ticks != self.split_ticks:
+            snapshot.split_ticks.clear()
+            snapshot.split_ticks.update(self.split_ticks)
+        snapshot.game_complete = self.game_complete
+        snapshot.displaytotaltime = self.displaytotaltime
+        snapshot.death_position = self.death_position
+        snapshot.background = self.background
+        snapshot.collected = level.coins.collected
+        snapshot.jumps_since_ground = self.physics_engine.jumps_since_ground
+
+        snapshot.player_position = player.position
+        snapshot.player_change = (player.change_x, player.change_y)
+        snapshot.facing = player.character_facedirection
+        snapshot.jumping = player.jumping
+        snapshot.climbing = player.climbing
+        snapshot.is_on_ladder = player.is_on_ladder
+        snapshot.animation_key = player.animation_key
+        snapshot.animation_time = player.animation_time
+
+        if snapshot.level_object is not level:
+            snapshot.level_object = level
+            snapshot.movers = {name: movers.new_state()
+                               for name, movers in level.movers.items()}
+        for name, movers in level.movers.items():
+            movers.save(snapshot.movers[name])
+        return snapshot
+
+    def restore(self, snapshot):
+        """
+        Put the game back to the state of a snapshot. The level is set
+        up first if the snapshot is of another one.
+        """
+        if snapshot.level is None:
+            raise ValueError("The snapshot hasn't been captured")
+        if snapshot.level != self.level or \
+                snapshot.level_object is not self.current_level:
+            self.level = snapshot.level
+            self.setup()
+        level = self.current_level
+        player = self.player_sprite
+
+        self.tick = snapshot.tick
+        self.keys = snapshot.keys
+        self.up_pressed = bool(self.keys & INPUT_UP)
+        self.down_pressed = bool(self.keys & INPUT_DOWN)
+        self.left_pressed = bool(self.keys & INPUT_LEFT)
+        self.right_pressed = bool(self.keys & INPUT_RIGHT)
+        self.jump_needs_reset = snapshot.jump_needs_reset
+        self.score = snapshot.score
+        self.death = snapshot.death
+        self.clock.set(snapshot.clock_ticks)
+        if self.split_ticks != snapshot.split_ticks:
+            self.split_ticks.clear()
+            self.split_ticks.update(snapshot.split_ticks)
+        self.game_complete = snapshot.game_complete
+        self.displaytotaltime = snapshot.displaytotaltime
+        self.death_position = snapshot.death_position
+        self.background = snapshot.background
+        level.coins.restore(snapshot.collected)
+        self.physics_engine.jumps_since_ground = snapshot.jumps_since_ground
+
+        player.position = snapshot.player_position
+        player.change_x, player.change_y = snapshot.player_change
+        player.character_facedirection = snapshot.facing
+        player.jumping = snapshot.jumping
+        player.climbing = snapshot.climbing
+        player.is_on_ladder = snapshot.is_on_ladder
+        player.set_animation(snapshot.animation_key,
+                             snapshot.animation_time)
+
+        for name, movers in level.movers.items():
+            movers.restore(snapshot.movers[name])
+        self.contacts.invalidate()
+
+    @property
+    def total_time(self):
+        """
+        Time spent on the current level, in seconds
+        """
+        return self.clock.seconds
+
+    @property
+    def output(self):
+        """
+        Time spent on the current level, as shown on the HUD
+        """
+        return self.clock.text
+
+    def set_keys(self, keys):
+        """
+        Change the input mask. Releasing up allows the next jump.
+        """
+        if keys == self.keys:
+            return
+        if self.keys & INPUT_UP and not keys & INPUT_UP:
+            self.jump_needs_reset = False
+        self.keys = keys
+        self.up_pressed = bool(keys & INPUT_UP)
+        self.down_pressed = bool(keys & INPUT_DOWN)
+        self.left_pressed = bool(keys & INPUT_LEFT)
+        self.right_pressed = bool(keys & INPUT_RIGHT)
+
+        self.process_keychange()
+
+    def process_keychange(self):
+        """
+        Called when we change a key up/down or we move on/off a ladder.
+        """
+        contacts = self.contacts
+
+        # Process up/down
+        if self.up_pressed and not self.down_pressed:
+            if contacts.on_ladder():
+                self.player_sprite.change_y = PLAYER_MOVEMENT_SPEED
+            elif contacts.jumpable() and not self.jump_needs_reset:
+                self.player_sprite.change_y = PLAYER_JUMP_SPEED
+                self.jump_needs_reset = True
+                self.events.append(EVENT_JUMP)
+        elif self.down_pressed and not self.up_pressed:
+            if contacts.on_ladder():
+                self.player_sprite.change_y = -PLAYER_MOVEMENT_SPEED
+
+        # Process up/down when on a ladder and no movement
+        if contacts.on_ladder():
+            if not self.up_pressed and not self.down_pressed:
+                self.player_sprite.change_y = 0
+            elif self.up_pressed and self.down_pressed:
+                self.player_sprite.change_y = 0
+
+        # Process left/right
+        if self.right_pressed and not self.left_pressed:
+            self.player_sprite.change_x = PLAYER_MOVEMENT_SPEED
+        elif self.left_pressed and not self.right_pressed:
+            self.player_sprite.change_x = -PLAYER_MOVEMENT_SPEED
+        else:
+            self.player_sprite.change_x = 0
+
+    def update_triggers(self):
+        """
+        Apply the triggers touching the player
+        """
+        player = self.player_sprite
+        center_x, center_y = player.position
+        self.background = None
+
+        for trigger in self.current_level.triggers.query(
+                player.left, player.bottom, player.right, player.top):
+            # The background changes when the middle of the player is in
+            if trigger.background and trigger.contains(center_x, center_y):
+                self.background = trigger.background
+            if trigger.sound:
+                self.events.append(trigger.sound)
+            if trigger.destination:
+                player.position = trigger.destination
+
+    def step(self, keys=None, delta_time=FIXED_DT):
+        """
+        Run one step of movement and game logic. Returns the list of
+        events that happened during the step.
+        """
+        self.events = []
+        self.tick += 1
+        profiler = self.profiler
+
+        # Movers and streamed chunks changed since the last step
+        self.contacts.invalidate()
+
+        # Load the parts of the map around the player
+        with profiler.phase("stream"):
+            self.current_level.stream_around(*self.player_sprite.position)
+
+        if keys is not None:
+            self.set_keys(keys)
+
+        if self.game_complete:
+            return self.events
+
+        # Move the player with the physics engine
+        with profiler.phase("physics"):
+            self.current_level.prepare_movers(*self.player_sprite.position)
+            self.physics_engine.update()
+            self.contacts.invalidate()
+
+        # Update animations, the contacts are only looked up once
+        with profiler.phase("contacts"):
+            contacts = self.contacts
+            if contacts.grounded():
+                self.player_sprite.can_jump = False
+            else:
+                self.player_sprite.can_jump = True
+
+            if contacts.on_ladder() and not contacts.grounded():
+                self.player_sprite.is_on_ladder = True
+                self.process_keychange()
+            else:
+                self.player_sprite.is_on_ladder = False
+                self.process_keychange()
+
+        # Update Animations
+        with profiler.phase("animation"):
+            self.scene.update_animation(
+                delta_time, [LAYER_NAME_COINS, LAYER_NAME_BACKGROUND,
+                             LAYER_NAME_PLAYER]
+            )
+
+        # Enemies and moving platforms, in place of scene.update()
+        with profiler.phase("scene_update"):
+            self.current_level.update_movers()
+
+        # One query finds the enemies and "don't touch" tiles the
+        # player is touching, the coin store finds the coins
+        level = self.current_level
+        hit_dont_touch = False
+        with profiler.phase("collisions"):
+            for coin in level.coins.touching(self.player_sprite):
+                # Collect the coin
+                level.coins.collect(coin)
+                self.events.append(EVENT_COIN)
+                self.score += 1
+                if (self.score == level.coins_needed - PRELOAD_COINS_LEFT
+                        and self.level < LAST_LEVEL):
+                    self.level_cache.preload(self.level + 1)
+            for layer_name, sprite in level.collisions.query(
+                    self.player_sprite):
+                if layer_name in (LAYER_NAME_DONT_TOUCH,
+                                  LAYER_NAME_ENEMIES):
+                    hit_dont_touch = True
+
+        # Checking if player hits an enemy or "don't touch" to
+        # reset the level
+        if hit_dont_touch:
+            self.events.append(EVENT_DEATH)
+            self.death += 1
+            self.death_position = self.player_sprite.position
+            self.setup()
+            return self.events
+
+        # Checking the triggers the player is in, one lookup finds
+        # every teleporter and background region touching the player
+        with profiler.phase("triggers"):
+            self.update_triggers()
+
+        # Checking if the player collects all the coins
+        # to go to the next level
+        if self.score == level.coins_needed:
+            # Saving the time the player collects all the coins
+            # so they can be added as a total time when the
+            # player finishes the game
+            self.split_ticks[self.level] = self.clock.ticks
+            if self.level == LAST_LEVEL:
+                self.displaytotaltime = (sum(self.split_ticks.values()) /
+                                         TICKS_PER_SECOND)
+                self.game_complete = True
+                self.events.append(EVENT_GAME_COMPLETE)
+                return self.events
+            self.level += 1
+            self.events.append(EVENT_LEVEL_COMPLETE)
+            self.setup()
+            return self.events
+
+        # Every step is one tick of game time, the HUD text is only
+        # made again when the hundredths shown change
+        with profiler.phase("timer"):
+            self.clock.advance()
+
+        return self.events
@@ -0,0 +1,108 @@
+"""
+Snapshots of the game state, for checkpoints, rewinding and branching
+headless runs from the middle of a level
+
+A snapshot is made once and filled in again on every capture. The
+arrays of the enemies and moving platforms are copied into arrays it
+already holds, so taking one every tick makes next to nothing new.
+"""
+
+# Snapshots kept for rewinding, and ticks between two of them
+REWIND_SNAPSHOTS = 20
+REWIND_INTERVAL = 30
+
+
+class Snapshot:
+    '''
+    Class holding everything a simulation needs to carry on from the
+    tick it was captured on
+    '''
+    __slots__ = (
+        "level", "level_object", "tick", "keys", "jump_needs_reset",
+        "score", "death", "clock_ticks", "split_ticks", "game_complete",
+        "displaytotaltime", "death_position", "background", "collected",
+        "jumps_since_ground", "player_position", "player_change",
+        "facing", "jumping", "climbing", "is_on_ladder",
+        "animation_key", "animation_time", "movers")
+
+    def __init__(self):
+        # Nothing has been captured while level is None
+        self.level = None
+
+        # The cached level the mover arrays were made for, they are
+        # made again for another one
+        self.level_object = None
+
+        self.tick = 0
+        self.keys = 0
+        self.jump_needs_reset = False
+        self.score = 0
+        self.death = 0
+        self.clock_ticks = 0
+        self.split_ticks = {}
+        self.game_complete = False
+        self.displaytotaltime = 0
+        self.death_position = None
+        self.background = None
+
+        # Mask of the coins collected on the level
+        self.collected = 0
+        self.jumps_since_ground = 0
+
+        self.player_position = (0.0, 0.0)
+        self.player_change = (0.0, 0.0)
+        self.facing = 0
+        self.jumping = False
+        self.climbing = False
+        self.is_on_ladder = False
+        self.animation_key = None
+        self.animation_time = 0.0
+
+        # Layer name -> what Movers.save() copies into
+        self.movers = {}
+
+
+class SnapshotRing:
+    '''
+    Class keeping the last few snapshots of a simulation, the oldest is
+    written over by the next capture
+    '''
+    def __init__(self, size=REWIND_SNAPSHOTS):
+        self.snapshots = [Snapshot() for _ in range(size)]
+        self.next = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.next = 0
+        self.count = 0
+
+    def capture(self, simulation):
+        """
+        Take a snapshot of a simulation in place of the oldest one
+        """
+        snapshot = simulation.capture(self.snapshots[self.next])
+        self.next = (self.next + 1) % len(self.snapshots)
+        self.count = min(self.count + 1, len(self.snapshots))
+        return snapshot
+
+    def latest(self, back=0):
+        """
+        Return the snapshot taken a number of captures before the last
+        """
+        if not 0 <= back < self.count:
+            raise IndexError(f"Only {self.count} snapshots are kept")
+        return self.snapshots[(self.next - 1 - back) % len(self.snapshots)]
+
+    def rewind(self, simulation, back=0):
+        """
+        Put a simulation back to a snapshot and forget the ones taken
+        after it. Returns the snapshot.
+        """
+        snapshot = self.latest(back)
+        simulation.restore(snapshot)
+        self.next = (self.next - back) % len(self.snapshots)
+        self.count -= back
+        return snapshot
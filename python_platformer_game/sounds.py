@@ -0,0 +1,119 @@
+"""
+Sound effects played from players made once, when the game starts
+
+arcade.play_sound() makes a new pyglet player for every sound. Here
+each effect has a few players of its own that are started again
+instead, an effect plays at most once a frame, and only so many
+effects play at the same time.
+"""
+import arcade
+import pyglet
+
+from simulation import EVENT_JUMP, EVENT_COIN, EVENT_DEATH, EVENT_TELEPORT
+
+# Sound file of each event and the players kept for it. Effects that
+# can overlap themselves get more than one.
+SOUND_EFFECTS = {
+    EVENT_COIN: (":resources:sounds/coin1.wav", 3),
+    EVENT_JUMP: (":resources:sounds/jump1.wav", 2),
+    EVENT_DEATH: (":resources:sounds/gameover1.wav", 1),
+    EVENT_TELEPORT: (":resources:sounds/phaseJump1.wav", 2),
+}
+
+# Most effects playing at the same time, more are dropped
+MAX_VOICES = 6
+
+
+class VoicePool:
+    '''
+    Class holding the players of one effect. A new play takes a player
+    that is free, or else each player in turn.
+    '''
+    def __init__(self, sound, voices):
+        self.source = sound.source
+        self.players = []
+        for _ in range(voices):
+            player = pyglet.media.Player()
+            # Centred, the way arcade.play_sound() places a sound
+            player.position = (0.0, 0.0, 1.0)
+            self.players.append(player)
+        self.next_player = 0
+
+    def playing(self):
+        """
+        Return how many of the players are playing
+        """
+        return sum(player.playing for player in self.players)
+
+    def play(self, volume):
+        """
+        Start the sound from the beginning on one of the players
+        """
+        player = None
+        for candidate in self.players:
+            if not candidate.playing:
+                player = candidate
+                break
+        if player is None:
+            player = self.players[self.next_player]
+            self.next_player = (self.next_player + 1) % len(self.players)
+
+        # A player that reached the end has let go of its source
+        if player.source is None:
+            player.queue(self.source)
+        else:
+            player.seek(0.0)
+        player.volume = volume
+        player.play()
+
+
+class SoundManager:
+    '''
+    Class playing the sound of each simulation event
+    '''
+    def __init__(self, effects=SOUND_EFFECTS, max_voices=MAX_VOICES,
+                 volume=1.0):
+        self.max_voices = max_voices
+        self.volume = volume
+        self.pools = {}
+        for event, (filename, voices) in effects.items():
+            self.pools[event] = VoicePool(arcade.load_sound(filename),
+                                          voices)
+
+        # Effects already played this frame
+        self.played = set()
+
+    def new_frame(self):
+        """
+        Let every effect play again, called once at the start of a frame
+        """
+        self.played.clear()
+
+    def play(self, event):
+        """
+        Play the sound of an event, unless it has played this frame or
+        too many sounds are playing
+        """
+        pool = self.pools.get(event)
+        if pool is None or event in self.played:
+            return
+        self.played.add(event)
+        if sum(other.playing() for other in self.pools.values()) >= \
+                self.max_voices:
+            return
+        pool.play(self.volume)
+
+
+class NullSoundManager:
+    '''
+    Class with the sound manager's methods that plays nothing, for runs
+    with no audio device
+    '''
+    def new_frame(self):
+        pass
+
+    def play(self, event):
+        pass
+
+
+NULL_SOUND_MANAGER = NullSoundManager()
@@ -0,0 +1,30 @@
+"""
+Tests of the level clock and the time shown on the HUD
+
+Run from this folder with: python -m pytest
+"""
+from clock import GameClock, TICKS_PER_SECOND, format_hundredths
+
+
+def test_format_hundredths_after_a_minute():
+    assert format_hundredths(5999) == "00:59:99"
+    assert format_hundredths(6000) == "01:00:00"
+    assert format_hundredths(6123) == "01:01:23"
+
+
+def test_format_hundredths_past_ten_minutes():
+    assert format_hundredths(60000) == "10:00:00"
+    assert format_hundredths(61234) == "10:12:34"
+
+
+def test_clock_text_follows_the_ticks_past_a_minute():
+    clock = GameClock()
+    clock.set(59 * TICKS_PER_SECOND)
+    for _ in range(2 * TICKS_PER_SECOND):
+        clock.advance()
+        assert clock.text == format_hundredths(
+            clock.ticks * 100 // TICKS_PER_SECOND)
+    assert clock.text == "01:01:00"
+
+    clock.set((10 * 60 + 5) * TICKS_PER_SECOND + 6)
+    assert clock.text == "10:05:10"
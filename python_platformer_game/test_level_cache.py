@@ -0,0 +1,82 @@
+"""
+Tests of loading levels through the level cache
+
+Run from this folder with: python -m pytest
+"""
+import os
+
+import arcade
+import pytest
+
+import level_cache
+from constants import (LAYER_NAME_COINS, LAYER_NAME_ENEMIES,
+                       LAYER_NAME_PLATORMS)
+from level_cache import (Level, LevelCache, StreamedLevel, compile_level,
+                         level_chunk_name)
+from textures import RegistrySprite
+
+
+def test_get_after_preload_builds_no_tile_map(game_dir, monkeypatch):
+    # The preload compiles the map if it has to, the file written is
+    # taken away again afterwards
+    compiled = os.path.exists(level_chunk_name(2))
+    cache = LevelCache()
+    try:
+        cache.preload(2)
+        cache.preloading[2].result()
+
+        def no_tile_map(*args, **kwargs):
+            raise AssertionError("get() built a TileMap on the main thread")
+
+        monkeypatch.setattr(arcade, "TileMap", no_tile_map)
+        level = cache.get(2)
+        assert isinstance(level, StreamedLevel)
+        level.close()
+    finally:
+        if not compiled and os.path.exists(level_chunk_name(2)):
+            os.remove(level_chunk_name(2))
+
+
+def test_compile_level_writes_its_own_partial_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    outputs = []
+
+    def failing_write(map_file, output):
+        outputs.append(output)
+        raise OSError("disk full")
+
+    monkeypatch.setattr(level_cache, "write_chunked_level", failing_write)
+    for _ in range(2):
+        with pytest.warns(UserWarning, match="Can't compile"):
+            assert compile_level(2) is None
+
+    # Two compiles never share a file, and neither is left behind
+    assert len(set(outputs)) == 2
+    assert os.listdir(tmp_path) == []
+
+
+def test_rotated_objects_and_animated_tiles(test_levels):
+    # The enemy turned a quarter clockwise about its bottom left corner
+    # and the coins animated
+    text = (test_levels / "map1_level_1.tmx").read_text()
+    text = text.replace('<object id="1"', '<object id="1" rotation="90"')
+    coin = text.index('<tile id="1">')
+    end = text.index('</tile>', coin)
+    text = (text[:end] + '<animation><frame tileid="1" duration="100"/>'
+            '<frame tileid="0" duration="100"/></animation>' + text[end:])
+    (test_levels / "map1_level_1.tmx").write_text(text)
+
+    level = Level(1)
+    assert isinstance(level.get_layer(LAYER_NAME_COINS)[0],
+                      arcade.AnimatedTimeBasedSprite)
+    assert isinstance(level.get_layer(LAYER_NAME_PLATORMS)[0],
+                      RegistrySprite)
+
+    streamed = StreamedLevel(1, compile_level(1))
+    try:
+        enemy = level.get_layer(LAYER_NAME_ENEMIES)[0]
+        streamed_enemy = streamed.get_layer(LAYER_NAME_ENEMIES)[0]
+        assert enemy.angle == streamed_enemy.angle == -90
+        assert streamed_enemy.position == pytest.approx(enemy.position)
+    finally:
+        streamed.close()
@@ -0,0 +1,31 @@
+"""
+Tests that the movers step the same with NumPy as without it
+
+Run from this folder with: python -m pytest
+"""
+import pytest
+
+import movers
+from constants import LAYER_NAME_ENEMIES
+from simulation import Simulation
+
+pytest.importorskip("numpy")
+
+
+def test_numpy_movers_match_the_loops(test_levels, scripted_keys,
+                                      game_state, monkeypatch):
+    states = []
+    for least in (0, float("inf")):
+        monkeypatch.setattr(movers, "NUMPY_MIN_MOVERS", least)
+        simulation = Simulation()
+        assert isinstance(simulation.current_level.movers[LAYER_NAME_ENEMIES],
+                          movers.NumpyMovers) == (least == 0)
+        # Standing still while the movers bounce off their boundaries
+        # away from the player, then playing on past them
+        for tick in range(300):
+            simulation.step(0)
+        states.append(game_state(simulation))
+        for tick in range(300):
+            simulation.step(scripted_keys(tick))
+        states.append(game_state(simulation))
+    assert states[:2] == states[2:]
@@ -0,0 +1,25 @@
+"""
+Tests of the level checker
+
+Run from this folder with: python -m pytest
+"""
+from reachability import analyze
+from simulation import Simulation, INPUT_RIGHT
+from test_replay import SCRIPT_TICKS
+
+
+def test_no_run_beats_the_par_time(test_levels, scripted_keys):
+    # Holding right the whole way is as quick as the test level goes
+    runs = []
+    for keys in (scripted_keys, lambda tick: INPUT_RIGHT):
+        simulation = Simulation()
+        for tick in range(SCRIPT_TICKS):
+            if simulation.level > 1:
+                break
+            simulation.step(keys(tick))
+        runs.append(simulation.split_ticks[1])
+
+    report = analyze("map1_level_1.tmx")
+    assert report["completable"]
+    assert 0 < report["par_ticks"] <= report["route_ticks"]
+    assert report["par_ticks"] <= min(runs)
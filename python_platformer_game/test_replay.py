@@ -0,0 +1,53 @@
+"""
+Tests of recording runs and replaying them
+
+Run from this folder with: python -m pytest
+"""
+from replay import Recording, replay
+from simulation import Simulation
+
+# Long enough for the scripted run to finish every test level
+SCRIPT_TICKS = 600
+
+
+def record_script(scripted_keys, ticks=SCRIPT_TICKS):
+    '''
+    Function to play a scripted input through a new simulation the way
+    the game records it. Returns the simulation and its recording.
+    '''
+    simulation = Simulation()
+    recording = Recording(simulation.level)
+    for tick in range(ticks):
+        keys = scripted_keys(tick)
+        simulation.step(keys)
+        recording.record(keys, simulation)
+    recording.finish(simulation)
+    return simulation, recording
+
+
+def test_recording_round_trip_keeps_split_ticks(test_levels, scripted_keys):
+    simulation, recording = record_script(scripted_keys)
+    assert simulation.game_complete
+    assert len(simulation.split_ticks) == 3
+
+    loaded = Recording.from_bytes(recording.to_bytes())
+    assert loaded.ticks == recording.ticks
+    assert loaded.time_ticks == recording.time_ticks
+
+    replayed, problems = replay(loaded)
+    assert problems == []
+    assert replayed.split_ticks == simulation.split_ticks
+    assert replayed.displaytotaltime == simulation.displaytotaltime
+
+
+def test_replay_ends_in_the_recorded_state(test_levels, scripted_keys,
+                                           game_state):
+    # Stopped halfway through the second level, with the movers still
+    # going and some of its coins collected
+    simulation, recording = record_script(scripted_keys, 320)
+    assert simulation.level == 2 and simulation.score > 0
+    assert simulation.death > 0
+
+    replayed, problems = replay(recording)
+    assert problems == []
+    assert game_state(replayed) == game_state(simulation)
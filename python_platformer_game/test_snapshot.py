@@ -0,0 +1,54 @@
+"""
+Tests of capturing the game state and putting it back
+
+Run from this folder with: python -m pytest
+"""
+from simulation import Simulation
+from snapshot import SnapshotRing
+
+
+def play(simulation, ticks, scripted_keys, game_state):
+    states = []
+    for _ in range(ticks):
+        simulation.step(scripted_keys(simulation.tick))
+        states.append(game_state(simulation))
+    return states
+
+
+def test_restore_replays_the_same_ticks(test_levels, scripted_keys,
+                                        game_state):
+    simulation = Simulation()
+    play(simulation, 100, scripted_keys, game_state)
+    snapshot = simulation.capture()
+    captured = game_state(simulation)
+
+    # The ticks after the snapshot collect coins, die to the enemy and
+    # move every mover
+    first = play(simulation, 100, scripted_keys, game_state)
+    assert first[-1]["score"] != captured["score"]
+    assert first[-1]["death"] != captured["death"]
+    assert first[-1]["movers"] != captured["movers"]
+
+    simulation.restore(snapshot)
+    assert game_state(simulation) == captured
+    assert play(simulation, 100, scripted_keys, game_state) == first
+
+
+def test_rewind_to_an_earlier_level(test_levels, scripted_keys, game_state):
+    simulation = Simulation()
+    ring = SnapshotRing()
+    states = []
+    for _ in range(320):
+        if simulation.tick % 30 == 0:
+            ring.capture(simulation)
+        simulation.step(scripted_keys(simulation.tick))
+        states.append(game_state(simulation))
+    assert simulation.level == 2
+
+    # Back to the last snapshot of the first level, which is set up
+    # again before its state is put back
+    snapshot = ring.rewind(simulation, back=2)
+    assert snapshot.level == 1 and simulation.level == 1
+    assert game_state(simulation) == states[snapshot.tick - 1]
+    assert play(simulation, 60, scripted_keys, game_state) == \
+        states[snapshot.tick:snapshot.tick + 60]
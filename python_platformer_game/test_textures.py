@@ -0,0 +1,36 @@
+"""
+Tests that loading the TMX levels adds nothing to the texture atlas
+
+Run from this folder with: python -m pytest
+"""
+import arcade
+import pytest
+
+import level_cache
+from level_cache import LevelCache
+from textures import build_atlas
+
+LEVELS = (1, 2, 3)
+
+
+@pytest.fixture
+def window(game_dir):
+    window = arcade.Window(800, 600, visible=False)
+    yield window
+    window.close()
+
+
+def test_tmx_levels_use_atlas_textures(window, monkeypatch):
+    # Load the TMX maps even when compiled ones are there
+    monkeypatch.setattr(level_cache, "compiled_map", lambda level: None)
+
+    atlas = build_atlas()
+    count = len(atlas._textures)
+    cache = LevelCache()
+    for level in LEVELS:
+        loaded = cache.get(level)
+        for sprite_list in loaded.scene.sprite_lists:
+            sprite_list.draw()
+            for sprite in sprite_list:
+                assert atlas.has_texture(sprite.texture), sprite.texture.name
+        assert len(atlas._textures) == count
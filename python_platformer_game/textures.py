@@ -0,0 +1,124 @@
+"""
+Textures that are loaded once and shared for the whole game
+"""
+import glob
+import os
+
+import arcade
+
+from constants import BACKGROUND_FILES, DEFAULT_BACKGROUND
+
+# Folders holding the tile and player animation images
+TILE_DIR = "Tiles"
+ANIMATION_DIR = "animations"
+
+
+class BackgroundRegistry:
+    '''
+    Class that decodes every background once so switching between them
+    is just picking another texture
+    '''
+    def __init__(self):
+        self.textures = {}
+        for name, filename in BACKGROUND_FILES.items():
+            self.textures[name] = arcade.load_texture(filename)
+
+    def get(self, name=None):
+        """
+        Return a background by name, or the default one
+        """
+        return self.textures.get(name or DEFAULT_BACKGROUND,
+                                 self.textures[DEFAULT_BACKGROUND])
+
+
+class TextureRegistry:
+    '''
+    Class that loads each image once. Asking again for the same image,
+    flipped or not, returns the texture already made for it.
+    '''
+    def __init__(self):
+        # (absolute path, flipped) -> texture
+        self.textures = {}
+
+        # (filename as asked for, flipped) -> texture, so the path is
+        # only resolved the first time a name is used
+        self.names = {}
+
+    def get(self, filename, flipped=False):
+        """
+        Return the texture of an image, mirrored if flipped is True
+        """
+        texture = self.names.get((filename, flipped))
+        if texture is not None:
+            return texture
+        key = (os.path.realpath(filename), flipped)
+        texture = self.textures.get(key)
+        if texture is None:
+            texture = arcade.load_texture(key[0],
+                                          flipped_horizontally=flipped)
+            self.textures[key] = texture
+        self.names[filename, flipped] = texture
+        return texture
+
+    def get_pair(self, filename):
+        """
+        Return the texture of an image and its mirror image
+        """
+        return [self.get(filename), self.get(filename, flipped=True)]
+
+    def preload(self):
+        """
+        Load every tile, and every animation frame both ways round
+        """
+        for filename in sorted(glob.glob(os.path.join(TILE_DIR, "*.png"))):
+            self.get(filename)
+        for filename in sorted(glob.glob(os.path.join(ANIMATION_DIR,
+                                                      "*.png"))):
+            self.get_pair(filename)
+
+
+# Shared by the player, the level loaders and the atlas
+texture_registry = TextureRegistry()
+
+
+class RegistrySprite(arcade.Sprite):
+    '''
+    Class for the tile sprites arcade's TileMap makes. A tile that is a
+    whole image takes its texture from the registry, so a TMX level
+    uses the textures already packed in the atlas instead of loading
+    its own copies under other names.
+    '''
+    def __init__(self, filename=None, scale=1, image_x=0, image_y=0,
+                 image_width=0, image_height=0, flipped_horizontally=False,
+                 flipped_vertically=False, flipped_diagonally=False,
+                 hit_box_algorithm="Simple", hit_box_detail=4.5, **kwargs):
+        if (filename and not image_x and not image_y and
+                not flipped_vertically and not flipped_diagonally and
+                hit_box_algorithm == "Simple"):
+            texture = texture_registry.get(filename, flipped_horizontally)
+            if (image_width in (0, texture.width) and
+                    image_height in (0, texture.height)):
+                super().__init__(scale=scale, texture=texture, **kwargs)
+                return
+        super().__init__(
+            filename, scale, image_x=image_x, image_y=image_y,
+            image_width=image_width, image_height=image_height,
+            flipped_horizontally=flipped_horizontally,
+            flipped_vertically=flipped_vertically,
+            flipped_diagonally=flipped_diagonally,
+            hit_box_algorithm=hit_box_algorithm,
+            hit_box_detail=hit_box_detail, **kwargs)
+
+
+def build_atlas(atlas=None):
+    '''
+    Function to pack every tile and animation frame into the atlas the
+    sprite lists draw from, so nothing is added to it during play.
+    Needs a window, the headless simulation never calls it.
+    '''
+    if atlas is None:
+        atlas = arcade.get_window().ctx.default_atlas
+    texture_registry.preload()
+    for texture in texture_registry.textures.values():
+        atlas.add(texture)
+    return atlas
@@ -0,0 +1,130 @@
+"""
+Region triggers read from the "Triggers" object layer of a map
+
+Each object in the layer is a rectangle (or point) with some of these
+properties, positions are in game pixels:
+
+    destination_x, destination_y   teleport the player there
+    sound                          event reported when the player enters
+    background                     background shown while inside
+    spawn_x, spawn_y               where the player starts the level
+"""
+from constants import TILE_SCALING, PLAYER_START_X, PLAYER_START_Y
+from grid import UniformGrid
+
+LAYER_NAME_TRIGGERS = "Triggers"
+
+# Size of a cell in the trigger index, in game pixels
+TRIGGER_CELL_SIZE = 128
+
+
+class Trigger:
+    '''
+    Class for one rectangle of the map that does something to the player
+    '''
+    def __init__(self, left, bottom, right, top, properties):
+        self.left = left
+        self.bottom = bottom
+        self.right = right
+        self.top = top
+
+        self.destination = None
+        if "destination_x" in properties and "destination_y" in properties:
+            self.destination = (float(properties["destination_x"]),
+                                float(properties["destination_y"]))
+        self.sound = properties.get("sound")
+        self.background = properties.get("background")
+
+    def overlaps(self, left, bottom, right, top):
+        return (left <= self.right and right >= self.left and
+                bottom <= self.top and top >= self.bottom)
+
+    def contains(self, x, y):
+        return self.left <= x <= self.right and self.bottom <= y <= self.top
+
+
+class TriggerIndex:
+    '''
+    Class that buckets triggers in a grid so finding the ones touching
+    the player is a single lookup however many triggers the map has
+    '''
+    def __init__(self, triggers=(), cell_size=TRIGGER_CELL_SIZE):
+        self.grid = UniformGrid(cell_size)
+        self.triggers = []
+        for trigger in triggers:
+            self.add(trigger)
+
+    def add(self, trigger):
+        self.triggers.append(trigger)
+        self.grid.add(trigger, trigger.left, trigger.bottom, trigger.right,
+                      trigger.top)
+
+    def query(self, left, bottom, right, top):
+        """
+        Return the triggers overlapping a box, each one only once
+        """
+        return [trigger for trigger in self.grid.query(left, bottom, right,
+                                                       top)
+                if trigger.overlaps(left, bottom, right, top)]
+
+
+def triggers_from_objects(objects, map_height):
+    '''
+    Function to build the trigger index and spawn point from the objects
+    of a trigger layer. Each object is a dict with the x, y, width and
+    height Tiled gives it and its properties, map_height is in Tiled
+    pixels.
+    '''
+    index = TriggerIndex()
+    spawn_point = (PLAYER_START_X, PLAYER_START_Y)
+
+    for tiled_object in objects:
+        properties = tiled_object["properties"]
+
+        if "spawn_x" in properties and "spawn_y" in properties:
+            spawn_point = (float(properties["spawn_x"]),
+                           float(properties["spawn_y"]))
+
+        # Tiled measures y down from the top of the map
+        x = tiled_object["x"]
+        y = tiled_object["y"]
+        left = x * TILE_SCALING
+        right = (x + tiled_object["width"]) * TILE_SCALING
+        top = (map_height - y) * TILE_SCALING
+        bottom = (map_height - y - tiled_object["height"]) * TILE_SCALING
+
+        trigger = Trigger(left, bottom, right, top, properties)
+        if trigger.destination or trigger.sound or trigger.background:
+            index.add(trigger)
+
+    return index, spawn_point
+
+
+def object_to_dict(tiled_object):
+    '''
+    Function to turn a pytiled_parser object into the dict the level
+    loaders share
+    '''
+    return {
+        "gid": getattr(tiled_object, "gid", None),
+        "x": tiled_object.coordinates.x,
+        "y": tiled_object.coordinates.y,
+        "width": tiled_object.size.width,
+        "height": tiled_object.size.height,
+        "rotation": tiled_object.rotation,
+        "properties": dict(tiled_object.properties or {}),
+    }
+
+
+def load_triggers(tile_map):
+    '''
+    Function to read the triggers and spawn point of a map.
+    Returns the trigger index and the (x, y) spawn point.
+    '''
+    layer = tile_map.get_tilemap_layer(LAYER_NAME_TRIGGERS)
+    objects = []
+    if layer is not None:
+        objects = [object_to_dict(tiled_object)
+                   for tiled_object in layer.tiled_objects]
+    return triggers_from_objects(objects,
+                                 tile_map.height * tile_map.tile_height)